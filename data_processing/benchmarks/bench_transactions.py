@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+
+# Times the transaction processors in transaction_builder over recorded fixtures and prints machine-readable results
+# that can be diffed between commits:
+#
+#   python bench_transactions.py [--scales 1 5 20] [--repeat 3] [--output results.json]
+#
+# Inputs are the committed fixtures, so they stay the same from commit to commit no matter what the builder or the
+# scrapers produce: fixtures/NBA_2021_transactions.html (a page synthesized once from data/transactions.json, or the
+# real page if --capture has copied it out of the scrapers' http cache), fixtures/supplementary_transaction_data.json
+# and the starting rosters in fixtures/players_start.csv and fixtures/team_data.csv. --freeze rewrites them all from
+# the current data/ files; results record the fixtures' hashes, and only results with the same hashes are comparable. Larger scales repeat the season with dates shifted a year per copy, for both inputs.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, '..', 'scripts')
+DATA_DIR = os.path.join(BENCH_DIR, '..', 'data')
+FIXTURE_DIR = os.path.join(BENCH_DIR, 'fixtures')
+PAGE_FIXTURE = os.path.join(FIXTURE_DIR, 'NBA_2021_transactions.html')
+PROSPORTS_FIXTURE = os.path.join(FIXTURE_DIR, 'supplementary_transaction_data.json')
+PLAYERS_FIXTURE = os.path.join(FIXTURE_DIR, 'players_start.csv')
+TEAMS_FIXTURE = os.path.join(FIXTURE_DIR, 'team_data.csv')
+FIXTURES = [PAGE_FIXTURE, PROSPORTS_FIXTURE, PLAYERS_FIXTURE, TEAMS_FIXTURE]
+BBREF_URL = "https://www.basketball-reference.com/leagues/NBA_2021_transactions.html"
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+import fetch
+import records
+from artifacts import file_hash
+import transaction_builder as tb
+from parsing import extract_element
+
+
+def capture_page():
+    os.chdir(SCRIPTS_DIR)
+    entry, content = fetch.read_entry(BBREF_URL)
+    if not entry:
+        sys.exit(f"{BBREF_URL} isn't in the http cache yet, run get_transactions.py first")
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(PAGE_FIXTURE, 'wb') as f:
+        f.write(content)
+
+
+def freeze_fixtures():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(PAGE_FIXTURE, 'w') as f:
+        f.write(synthesize_page(records.load_transactions(os.path.join(DATA_DIR, 'transactions.json'))))
+
+    with open(os.path.join(DATA_DIR, 'supplementary_transaction_data.json'), 'r') as f:
+        prosports_transactions = json.load(f)
+    with open(PROSPORTS_FIXTURE, 'w') as f:
+        json.dump(prosports_transactions, f)
+
+    for fixture in [PLAYERS_FIXTURE, TEAMS_FIXTURE]:
+        shutil.copyfile(os.path.join(DATA_DIR, os.path.basename(fixture)), fixture)
+
+
+def synthesize_page(transactions):
+    # Rebuild bbref-style markup (team/player links with data-attr-from/to on trades) from already-processed transactions
+    team_link = lambda team_id, attr='': f'<a {attr}href="/teams/{team_id}/2021.html">{team_id}</a>'
+    player_link = lambda player_id: f'<a href="/players/{player_id[0]}/{player_id}.html">{player_id}</a>'
+
+    by_date = defaultdict(list)
+    for transaction in transactions:
+        if transaction.players and transaction.type in ('signed', 'claimed', 'waived', 'traded'):
+            by_date[transaction.date].append(transaction)
+
+    dates = []
+    for date in sorted(by_date, reverse=True):
+        paragraphs = []
+        for transaction in by_date[date]:
+            players = transaction.players
+
+            if transaction.type in ('signed', 'claimed'):
+                paragraphs.append(f"The {team_link(players[0].to_team)} {transaction.type} {player_link(players[0].player_id)}.")
+            elif transaction.type == 'waived':
+                paragraphs.append(f"The {team_link(players[0].from_team)} waived {player_link(players[0].player_id)}.")
+            else:
+                legs = defaultdict(list)
+                for player in players:
+                    legs[(player.from_team, player.to_team)].append(player.player_id)
+
+                chunks = [f"the {team_link(from_team, f'data-attr-from={chr(34)}{from_team}{chr(34)} ')} traded {' '.join(player_link(x) for x in player_ids)} to the {team_link(to_team, f'data-attr-to={chr(34)}{to_team}{chr(34)} ')}" for (from_team, to_team), player_ids in legs.items()]
+                prefix = f"In a {len(set(sum(legs.keys(), ())))}-team trade, " if len(legs) > 2 else ""
+                paragraphs.append(prefix + "; ".join(chunks) + ".")
+
+        date_string = datetime.strptime(date, "%Y-%m-%d").strftime("%B %-d, %Y")
+        dates.append(f"<li><span>{date_string}</span>{''.join(f'<p>{x}</p>' for x in paragraphs)}</li>")
+
+    return f'<html><body><div id="content"><ul class="page_index">{"".join(dates)}</ul></div></body></html>'
+
+
+def shift_date_string(date_string, years):
+    date = datetime.strptime(date_string, "%B %d, %Y")
+    return (date + timedelta(days=365*years)).strftime("%B %-d, %Y")
+
+
+def scale_page(html, scale):
+    content = extract_element(extract_element(html, "div", {"id": "content"}), "ul", {"class": "page_index"})
+    dates = re.findall(r'<li\b.*?</li>', content, flags=re.DOTALL)
+
+    # Newest first, like the real page
+    copies = []
+    for year in reversed(range(scale)):
+        for date in dates:
+            copies.append(re.sub(r'<span>([^<?]+)</span>', lambda m: f"<span>{shift_date_string(m.group(1), year)}</span>", date, count=1))
+
+    return f'<html><body><div id="content"><ul class="page_index">{"".join(copies)}</ul></div></body></html>'
+
+
+def scale_prosports(prosports_transactions, scale):
+    scaled = []
+    for year in range(scale):
+        for transaction in prosports_transactions:
+            date = datetime.strptime(transaction['date'], "%Y-%m-%d") + timedelta(days=365*year)
+            scaled.append(transaction | {"date": date.strftime("%Y-%m-%d")})
+
+    return scaled
+
+
+def load_start_state():
+    return tb.BuildContext(
+        tb.load_players(PLAYERS_FIXTURE),
+        tb.load_team_data(TEAMS_FIXTURE)
+    )
+
+
+def bbref_paragraphs(transaction_dates):
+    for date, formatted_date in tb.iter_dates(transaction_dates):
+        for transaction in date.find_all("p"):
+            transaction_text = transaction.text
+            if " hired " in transaction_text or "Exhibit 10" in transaction_text or "two-way contract" in transaction_text:
+                continue
+            yield formatted_date, transaction, transaction_text
+
+
+# Each stage does its setup (parsing, fresh rosters) untimed and returns (run, items); only run() is measured
+
+def stage_parse(html, prosports_transactions, start_state):
+    return lambda: tb.get_transaction_dates(html), 1
+
+
+def stage_build(html, prosports_transactions, start_state):
+    transaction_dates = tb.get_transaction_dates(html)
+    return lambda: tb.build_transactions(transaction_dates, prosports_transactions, start_state), len(transaction_dates)
+
+
+def stage_bbref(html, prosports_transactions, start_state):
+    paragraphs = list(bbref_paragraphs(tb.get_transaction_dates(html)))
+    context = start_state.copy()
+
+    def run():
+        for formatted_date, transaction, transaction_text in paragraphs:
+            tb.process_bbref_transaction(context, transaction, transaction_text, formatted_date)
+
+    return run, len(paragraphs)
+
+
+def stage_prosports(html, prosports_transactions, start_state):
+    context = start_state.copy()
+
+    def run():
+        for transaction in prosports_transactions:
+            tb.process_prosports_transaction(context, transaction)
+
+    return run, len(prosports_transactions)
+
+
+def stage_trade(html, prosports_transactions, start_state):
+    trades = [x.find_all("a") for _, x, text in bbref_paragraphs(tb.get_transaction_dates(html)) if 'traded' in text and '-team trade' not in text]
+    context = start_state.copy()
+
+    def run():
+        for links in trades:
+            tb.process_trade(context, links)
+
+    return run, len(trades)
+
+
+def stage_multi_team(html, prosports_transactions, start_state):
+    trades = [x for _, x, text in bbref_paragraphs(tb.get_transaction_dates(html)) if '-team trade' in text]
+    context = start_state.copy()
+
+    def run():
+        for transaction in trades:
+            tb.process_multi_team(context, transaction)
+
+    return run, len(trades)
+
+
+STAGES = {
+    "parse_page": stage_parse,
+    "process_bbref_transaction": stage_bbref,
+    "process_prosports_transaction": stage_prosports,
+    "process_trade": stage_trade,
+    "process_multi_team": stage_multi_team,
+    "build": stage_build
+}
+
+
+def run_stage(stage, html, prosports_transactions, start_state, repeat):
+    wall_times = []
+    for _ in range(repeat):
+        run, items = stage(html, prosports_transactions, start_state)
+        start = time.perf_counter()
+        run()
+        wall_times.append(time.perf_counter() - start)
+
+    # Separate run for memory so tracemalloc's overhead doesn't leak into the timings
+    run, items = stage(html, prosports_transactions, start_state)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall_s = min(wall_times)
+    return {
+        "wall_s": round(wall_s, 5),
+        "peak_kb": round(peak / 1024, 1),
+        "items": items,
+        "items_per_s": round(items / wall_s, 1) if wall_s else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 5, 20])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--output', help="Write results here instead of stdout")
+    parser.add_argument('--capture', action='store_true', help="Copy the cached bbref transactions page into fixtures/ and exit")
+    parser.add_argument('--freeze', action='store_true', help="Rewrite the fixtures from the current data/ files and exit")
+    args = parser.parse_args()
+
+    if args.capture:
+        return capture_page()
+    if args.freeze:
+        return freeze_fixtures()
+
+    missing = [x for x in FIXTURES if not os.path.exists(x)]
+    if missing:
+        sys.exit(f"Missing benchmark fixture(s): {', '.join(missing)}. Restore them from git, or run --freeze/--capture (results won't be comparable with older ones).")
+
+    with open(PAGE_FIXTURE, 'r') as f:
+        html = f.read()
+
+    start_state = load_start_state()
+    prosports_transactions = tb.load_prosports_transactions(PROSPORTS_FIXTURE)
+
+    fixtures = {os.path.basename(x): file_hash(x)[:12] for x in FIXTURES}
+    results = {"fixtures": fixtures, "repeat": args.repeat, "scales": {}}
+    for scale in args.scales:
+        scaled_html = scale_page(html, scale)
+        scaled_prosports = scale_prosports(prosports_transactions, scale)
+        results["scales"][f"{scale}x"] = {name: run_stage(STAGES[name], scaled_html, scaled_prosports, start_state, args.repeat) for name in args.stages}
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import re
+import sys
+import tempfile
+
+import bench_transactions as bench
+from parsing import extract_element
+from transaction_builder import DedupIndex, build_transactions, checkpoints
+
+
+# Checks that a build resumed from checkpoints matches a fresh build, over the committed benchmark fixtures:
+#
+#   python check_resume.py [--cuts 0.25 0.5 0.9]
+#
+# For each cut, the page is first built with only its oldest dates (the page as it stood on an earlier day) and then
+# resumed against the full page, the way get_transactions.py runs from day to day. The resumed transactions and the
+# dedup merges (dedup_report.json) must equal a fresh build's. Checkpoints go to a temporary directory.
+
+SEASON = 2021
+
+
+def truncate_page(html, fraction):
+    # Keeps the oldest fraction of the dates; the page lists them newest first
+    content = extract_element(extract_element(html, "div", {"id": "content"}), "ul", {"class": "page_index"})
+    dates = re.findall(r'<li\b.*?</li>', content, flags=re.DOTALL)
+    kept = dates[len(dates) - int(len(dates) * fraction):]
+    return f'<html><body><div id="content"><ul class="page_index">{"".join(kept)}</ul></div></body></html>'
+
+
+def build_resumed(pages, prosports_transactions, start_state):
+    # One get_transactions.py run per page, sharing a checkpoint
+    for html in pages:
+        checkpoint, season_transactions = checkpoints.load_checkpoint(SEASON)
+        state = start_state.copy()
+        if checkpoint:
+            state.restore_rosters(checkpoint['rosters'])
+            state.dedup = DedupIndex.from_json(checkpoint['dedup'])
+
+        resume_point = checkpoint
+
+        def on_date(formatted_date, date_transactions, context):
+            nonlocal resume_point
+            resume_point = checkpoints.save_checkpoint(SEASON, formatted_date, date_transactions, context, previous=resume_point)
+
+        new_transactions, state = build_transactions(html, prosports_transactions, state, after_date=checkpoint['last_date'] if checkpoint else '', on_date=on_date)
+
+    return season_transactions + new_transactions, state.dedup.merges
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cuts', nargs='+', type=float, default=[0.25, 0.5, 0.9])
+    args = parser.parse_args()
+
+    with open(bench.PAGE_FIXTURE, 'r') as f:
+        html = f.read()
+    start_state = bench.load_start_state()
+    prosports_transactions = bench.tb.load_prosports_transactions(bench.PROSPORTS_FIXTURE)
+
+    fresh_transactions, fresh_state = build_transactions(html, prosports_transactions, start_state)
+    fresh = [x.to_json() for x in fresh_transactions], fresh_state.dedup.merges
+
+    failed = False
+    for cut in args.cuts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoints.CHECKPOINT_DIR = tmp_dir
+            resumed_transactions, resumed_merges = build_resumed([truncate_page(html, cut), html], prosports_transactions, start_state)
+
+        resumed = [x.to_json() for x in resumed_transactions], resumed_merges
+        for name, a, b in [("transactions", fresh[0], resumed[0]), ("dedup merges", fresh[1], resumed[1])]:
+            ok = a == b
+            failed |= not ok
+            print(f"cut {cut}: {name} {'match' if ok else 'differ'} ({len(a)} fresh, {len(b)} resumed)")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+
+import records
+from artifacts import write_if_changed
+
+
+# Per-team aggregates (payroll, roster size, summed stats) on every transaction date, so consumers can read a series
+# instead of replaying transactions and re-summing players after each one.
+#
+# Every player contributes one event for their starting team plus one per move in transactions.json. An event's values
+# count for its team from its date until that player's next event, so each event adds its values to (team, date) and
+# takes them back off at (team, next event date); a cumulative sum over dates then gives every team's totals at once.
+
+# Summed for the newest season in the players file, e.g. 2021_ws and 2021_vorp
+DEFAULT_STATS = ['ws', 'vorp']
+
+
+def build_events(players, transactions):
+    # players: {player_id: records.Player}, transactions: records.Transaction list in the order they happened.
+    # Salaries are NaN on events that don't change them.
+    player_index = {player_id: i for i, player_id in enumerate(players)}
+    dates = sorted(set(x.date for x in transactions))
+    date_index = {date: i + 1 for i, date in enumerate(dates)}
+    team_ids = sorted(set(x.team_id for x in players.values()) | set(move.to_team for x in transactions for move in x.players))
+    team_index = {team_id: i for i, team_id in enumerate(team_ids)}
+
+    event_player = list(range(len(players)))
+    event_date = [0] * len(players)
+    event_team = [team_index[x.team_id] for x in players.values()]
+    event_salary = [float(x.preseason_salary or 0) for x in players.values()]
+
+    for transaction in transactions:
+        for i, move in enumerate(transaction.players):
+            if move.player_id not in player_index:
+                continue
+
+            event_player.append(player_index[move.player_id])
+            event_date.append(date_index[transaction.date])
+            event_team.append(team_index[move.to_team])
+            # Same rule as commit_transaction: a salary change applies to the first player in the transaction
+            event_salary.append(transaction.salary_data.end_salary if transaction.salary_data and i == 0 else np.nan)
+
+    events = {
+        "player": np.array(event_player),
+        "date": np.array(event_date),
+        "team": np.array(event_team),
+        "salary": np.array(event_salary, dtype=float)
+    }
+
+    return [None] + dates, team_ids, events
+
+
+def season_stats(players, stats=DEFAULT_STATS):
+    season = next(iter(players.values())).schema.seasons()[-1]
+    return [f"{season}_{x}" for x in stats]
+
+
+def team_series(players, transactions, stat_fields=None):
+    stat_fields = stat_fields or season_stats(players)
+    dates, team_ids, events = build_events(players, transactions)
+
+    # Group each player's events together, keeping transaction order within a player
+    order = np.argsort(events['player'], kind='stable')
+    player, date, team, salary = (events[x][order] for x in ['player', 'date', 'team', 'salary'])
+
+    # Carry salaries forward through events that didn't set one (every player's first event always does)
+    defined = np.where(~np.isnan(salary), np.arange(len(salary)), 0)
+    salary = salary[np.maximum.accumulate(defined)]
+
+    # Each event lasts until the same player's next event, or past the last date
+    end_date = np.append(date[1:], len(dates))
+    end_date[np.append(player[1:] != player[:-1], True)] = len(dates)
+
+    player_list = list(players.values())
+    schema = player_list[0].schema
+    stats = np.nan_to_num(np.array([x.stats for x in player_list]).reshape(len(player_list), -1))
+
+    values = {"payroll": salary, "roster_size": np.ones(len(player))}
+    for field in stat_fields:
+        values[field] = stats[player, schema.stat_index[field]]
+
+    series = {}
+    for name, value in values.items():
+        grid = np.zeros((len(team_ids), len(dates) + 1))
+        np.add.at(grid, (team, date), value)
+        np.add.at(grid, (team, end_date), -value)
+        series[name] = np.cumsum(grid, axis=1)[:, :len(dates)]
+
+    return dates, team_ids, series
+
+
+def dumps_aggregates(players, transactions, stat_fields=None):
+    stat_fields = stat_fields or season_stats(players)
+    dates, team_ids, series = team_series(players, transactions, stat_fields)
+    schema = next(iter(players.values())).schema
+
+    # Round sums to the precision of the column they came from, which also clears float noise from the running totals
+    decimals = {"payroll": 0, "roster_size": 0} | {x: schema.stat_formats[schema.stat_index[x]][0] for x in stat_fields}
+    rounded = lambda name, row: [int(x) for x in np.rint(row)] if decimals[name] == 0 else [round(float(x), decimals[name]) for x in row]
+
+    return json.dumps({
+        "dates": dates,
+        "teams": team_ids,
+        "series": {name: {team_id: rounded(name, grid[i]) for i, team_id in enumerate(team_ids)} for name, grid in series.items()}
+    }, separators=(',', ':'))
+
+
+def write_aggregates(players_file, transactions, out_files, stat_fields=None):
+    data = dumps_aggregates(records.load_players(players_file), transactions, stat_fields)
+    for filename in out_files:
+        write_if_changed(filename, data)
@@ -0,0 +1,33 @@
+import hashlib
+import os
+
+
+# Output files are only rewritten when their content actually changes, so unchanged artifacts keep their mtime and
+# anything downstream (pipeline.py's fingerprints, deploys of public/data) can tell nothing happened.
+
+def file_hash(filename):
+    if not os.path.exists(filename):
+        return None
+
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def write_if_changed(filename, data):
+    # Returns True if the file was (re)written
+    content = data.encode('utf-8') if isinstance(data, str) else data
+
+    if os.path.exists(filename) and os.path.getsize(filename) == len(content):
+        with open(filename, 'rb') as f:
+            if f.read() == content:
+                return False
+
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(filename + '.tmp', filename)
+
+    return True
@@ -0,0 +1,229 @@
+import json
+import math
+from datetime import date, timedelta
+
+import records
+from artifacts import write_if_changed
+
+
+# Compact column-oriented encoding of players_start.csv + transactions.json, shipped as one file for the frontend.
+#
+# Player columns are typed once here instead of being parsed from text on every page load:
+#   "fixed":  decimal stats stored as integers with a per-column scale (".592" -> 592, scale 1000)
+#   "dict":   low-cardinality strings (team ids, positions) stored as indexes into a values list
+#   "path":   urls/paths (img_link) split into a dictionary-encoded directory plus the file name
+#   "constant": columns with a single value for every row
+#   "string": everything else
+# Missing values are null. Transactions reference players/teams/types by index, dates are day deltas from the previous
+# record, nested player movements are flattened with offsets, and ids are rebuilt from (type, date, players) when they match.
+
+FORMAT_VERSION = 1
+
+
+def parse_decimal(value):
+    try:
+        float(value)
+    except ValueError:
+        return None
+
+    return len(value.split('.')[1]) if '.' in value else 0
+
+
+def encode_column(values):
+    if len(set(values)) == 1:
+        return {"type": "constant", "value": values[0] if values[0] != '' else None}
+
+    present = [x for x in values if x != '']
+
+    decimals = [parse_decimal(x) for x in present]
+    if present and None not in decimals:
+        scale = 10 ** max(decimals)
+        return {
+            "type": "fixed",
+            "scale": scale,
+            "values": [round(float(x) * scale) if x != '' else None for x in values]
+        }
+
+    distinct = sorted(set(present))
+    if len(distinct) <= len(values) // 4:
+        lookup = {x: i for i, x in enumerate(distinct)}
+        return {
+            "type": "dict",
+            "dictionary": distinct,
+            "values": [lookup[x] if x != '' else None for x in values]
+        }
+
+    if all('/' in x for x in present):
+        directories = sorted(set(x.rsplit('/', 1)[0] for x in present))
+        lookup = {x: i for i, x in enumerate(directories)}
+        return {
+            "type": "path",
+            "dictionary": directories,
+            "values": [[lookup[x.rsplit('/', 1)[0]], x.rsplit('/', 1)[1]] if x != '' else None for x in values]
+        }
+
+    return {"type": "string", "values": [x if x != '' else None for x in values]}
+
+
+def decode_column(column, count):
+    if column['type'] == 'constant':
+        return [column['value']] * count
+    elif column['type'] == 'fixed':
+        scale = column['scale']
+        if scale == 1:
+            return [x for x in column['values']]
+        return [x / scale if x is not None else None for x in column['values']]
+    elif column['type'] == 'dict':
+        return [column['dictionary'][x] if x is not None else None for x in column['values']]
+    elif column['type'] == 'path':
+        return [f"{column['dictionary'][x[0]]}/{x[1]}" if x is not None else None for x in column['values']]
+
+    return list(column['values'])
+
+
+def encode_stat_column(players, field):
+    # Numeric record columns already carry their values and decimal places, so they skip the text sniffing in encode_column
+    i = players[0].schema.stat_index[field]
+    decimals, leading_zero = players[0].schema.stat_formats[i]
+    values = [x.stats[i] for x in players]
+
+    formatted = set(records.format_number(x, decimals, leading_zero) for x in values)
+    if len(formatted) == 1:
+        value = formatted.pop()
+        return {"type": "constant", "value": value if value != '' else None}
+
+    scale = 10 ** decimals
+    return {
+        "type": "fixed",
+        "scale": scale,
+        "values": [round(x * scale) if not math.isnan(x) else None for x in values]
+    }
+
+
+def encode_players(players):
+    # players: records.Player list
+    fieldnames = players[0].schema.fields
+    return {
+        "count": len(players),
+        "fields": fieldnames,
+        "columns": {field: encode_stat_column(players, field) if players[0].schema.is_stat(field) else encode_column([x.formatted(field) for x in players]) for field in fieldnames}
+    }
+
+
+def decode_players(encoded):
+    columns = {field: decode_column(encoded['columns'][field], encoded['count']) for field in encoded['fields']}
+    return [{field: columns[field][i] for field in encoded['fields']} for i in range(encoded['count'])]
+
+
+def default_transaction_id(transaction_type, transaction_date, player_ids):
+    return f"{transaction_type}_{transaction_date}_{'-'.join(sorted(player_ids))}"
+
+
+def encode_transactions(transactions):
+    # transactions: records.Transaction list
+    player_ids, team_ids, types = {}, {}, {}
+    intern = lambda lookup, value: lookup.setdefault(value, len(lookup))
+
+    encoded = {
+        "count": len(transactions),
+        "date_base": transactions[0].date if transactions else None,
+        "date_delta": [],
+        "type": [],
+        "text": [],
+        "id_overrides": {},
+        "players_offset": [0],
+        "player": [],
+        "from_team": [],
+        "to_team": [],
+        "affected_teams_offset": [0],
+        "affected_teams": [],
+        "salary_data": {}
+    }
+
+    previous_date = date.fromisoformat(encoded['date_base']) if transactions else None
+    for i, transaction in enumerate(transactions):
+        transaction_date = date.fromisoformat(transaction.date)
+        encoded['date_delta'].append((transaction_date - previous_date).days)
+        previous_date = transaction_date
+
+        encoded['type'].append(intern(types, transaction.type))
+        encoded['text'].append(transaction.text)
+
+        for player in transaction.players:
+            encoded['player'].append(intern(player_ids, player.player_id))
+            encoded['from_team'].append(intern(team_ids, player.from_team))
+            encoded['to_team'].append(intern(team_ids, player.to_team))
+        encoded['players_offset'].append(len(encoded['player']))
+
+        encoded['affected_teams'] += [intern(team_ids, x) for x in transaction.affected_teams]
+        encoded['affected_teams_offset'].append(len(encoded['affected_teams']))
+
+        if transaction.id != default_transaction_id(transaction.type, transaction.date, [x.player_id for x in transaction.players]):
+            encoded['id_overrides'][str(i)] = transaction.id
+
+        if transaction.salary_data:
+            encoded['salary_data'][str(i)] = [transaction.salary_data.start_salary, transaction.salary_data.end_salary]
+
+    encoded['player_ids'] = list(player_ids)
+    encoded['team_ids'] = list(team_ids)
+    encoded['types'] = list(types)
+
+    return encoded
+
+
+def decode_transactions(encoded):
+    transactions = []
+
+    current_date = date.fromisoformat(encoded['date_base']) if encoded['count'] else None
+    for i in range(encoded['count']):
+        current_date += timedelta(days=encoded['date_delta'][i])
+        transaction_date = current_date.isoformat()
+        transaction_type = encoded['types'][encoded['type'][i]]
+
+        players = []
+        for j in range(encoded['players_offset'][i], encoded['players_offset'][i+1]):
+            players.append({
+                "player_id": encoded['player_ids'][encoded['player'][j]],
+                "from_team": encoded['team_ids'][encoded['from_team'][j]],
+                "to_team": encoded['team_ids'][encoded['to_team'][j]]
+            })
+
+        affected_teams = encoded['affected_teams'][encoded['affected_teams_offset'][i]:encoded['affected_teams_offset'][i+1]]
+
+        transaction = {
+            "id": encoded['id_overrides'].get(str(i), default_transaction_id(transaction_type, transaction_date, [x['player_id'] for x in players])),
+            "type": transaction_type,
+            "date": transaction_date,
+            "players": players,
+            "affected_teams": [encoded['team_ids'][x] for x in affected_teams],
+            "text": encoded['text'][i]
+        }
+
+        if str(i) in encoded['salary_data']:
+            start_salary, end_salary = encoded['salary_data'][str(i)]
+            transaction['salary_data'] = {'start_salary': start_salary, 'end_salary': end_salary}
+
+        transactions.append(transaction)
+
+    return transactions
+
+
+def dumps_columnar(players, transactions):
+    return json.dumps({
+        "version": FORMAT_VERSION,
+        "players": encode_players(players),
+        "transactions": encode_transactions(transactions)
+    }, separators=(',', ':'))
+
+
+def write_columnar(players_file, transactions, out_files):
+    data = dumps_columnar(list(records.load_players(players_file).values()), transactions)
+    for filename in out_files:
+        write_if_changed(filename, data)
+
+
+def load_columnar(filename):
+    with open(filename, 'r') as f:
+        data = json.load(f)
+
+    return decode_players(data['players']), decode_transactions(data['transactions'])
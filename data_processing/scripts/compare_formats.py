@@ -0,0 +1,118 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import columnar
+import records
+
+
+# Size and parse-time comparison of the columnar artifact against the players_start.csv + transactions.json it replaces.
+# Read-only: the columnar artifact is built into a temporary directory, never over ../data/columnar.json.
+#
+# Parse time is measured twice. "python_load_ms" is json.load/csv here; "browser_decode_ms" runs what the app does in
+# node (JSON.parse + src/utils/columnar.js against JSON.parse + a csv split, the file having no quoted fields), and is
+# the number that matters for the page. It's left out if node isn't installed.
+
+DECODER = '../../src/utils/columnar.js'
+
+NODE_BENCHMARK = '''
+import { readFileSync } from 'fs';
+const [decoderFile, playersFile, transactionsFile, columnarFile, repeat] = process.argv.slice(1);
+const { default: decodeColumnar } = await import(decoderFile);
+
+const parseCsv = (text) => {
+  const [header, ...rows] = text.replace(/^\\ufeff/, '').split(/\\r?\\n/).filter(x => x);
+  const fields = header.split(',');
+  return rows.map(row => {
+    const values = row.split(',');
+    return Object.fromEntries(fields.map((field, i) => [field, values[i]]));
+  });
+};
+
+const timed = (load) => {
+  load();
+  const start = process.hrtime.bigint();
+  for (let i = 0; i < repeat; i++) {
+    load();
+  }
+  return Number(process.hrtime.bigint() - start) / 1e6 / repeat;
+};
+
+const players = readFileSync(playersFile, 'utf-8');
+const transactions = readFileSync(transactionsFile, 'utf-8');
+const encoded = readFileSync(columnarFile, 'utf-8');
+console.log(JSON.stringify({
+  current: timed(() => [parseCsv(players), JSON.parse(transactions)]),
+  columnar: timed(() => decodeColumnar(JSON.parse(encoded)))
+}));
+'''
+
+
+def timed(load, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = load()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def load_current():
+    with open('../data/players_start.csv', 'r', encoding='utf-8-sig') as f:
+        players = [x for x in csv.DictReader(f)]
+    with open('../data/transactions.json', 'r') as f:
+        transactions = json.load(f)
+    return players, transactions
+
+
+def file_sizes(filenames):
+    raw = sum(os.path.getsize(x) for x in filenames)
+    compressed = 0
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            compressed += len(gzip.compress(f.read(), compresslevel=9))
+    return raw, compressed
+
+
+def browser_decode(tmp_dir, columnar_file, repeat=20):
+    # {"current": ms, "columnar": ms}, or None without node. The decoder is copied to a .mjs so node loads it as a module.
+    if not shutil.which('node'):
+        return None
+
+    decoder = os.path.join(tmp_dir, 'columnar.mjs')
+    shutil.copyfile(DECODER, decoder)
+    output = subprocess.run(
+        ['node', '--input-type=module', '-e', NODE_BENCHMARK, decoder, '../data/players_start.csv', '../data/transactions.json', columnar_file, str(repeat)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    columnar_file = os.path.join(tmp_dir, 'columnar.json')
+
+    (players, transactions), current_ms = timed(load_current)
+
+    columnar.write_columnar('../data/players_start.csv', records.load_transactions('../data/transactions.json'), [columnar_file])
+    (columnar_players, columnar_transactions), columnar_ms = timed(lambda: columnar.load_columnar(columnar_file))
+
+    current_raw, current_gzip = file_sizes(['../data/players_start.csv', '../data/transactions.json'])
+    columnar_raw, columnar_gzip = file_sizes([columnar_file])
+
+    assert len(columnar_players) == len(players) and [x['player_id'] for x in columnar_players] == [x['player_id'] for x in players]
+    assert [x['id'] for x in columnar_transactions] == [x['id'] for x in transactions]
+
+    browser_ms = browser_decode(tmp_dir, columnar_file)
+
+result = {
+    "current": {"bytes": current_raw, "gzip_bytes": current_gzip, "python_load_ms": round(current_ms, 2)},
+    "columnar": {"bytes": columnar_raw, "gzip_bytes": columnar_gzip, "python_load_ms": round(columnar_ms, 2)}
+}
+if browser_ms:
+    for name in result:
+        result[name]["browser_decode_ms"] = round(browser_ms[name], 2)
+
+print(json.dumps(result, indent=2))
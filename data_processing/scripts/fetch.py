@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+import metrics
+
+
+# All scrapers are run from data_processing/scripts, so paths are relative to that directory like the rest of the pipeline
+CACHE_DIR = '../data/http_cache'
+DEFAULT_TTL = 60 * 60 * 12
+
+# Seconds between requests to the same host. HOST_DELAYS holds the hosts with published limits and always applies to
+# them; any other host gets HOST_DELAY, or whatever delay a limiter was created with. bbref allows 20 requests a
+# minute and blocks clients that go over it.
+HOST_DELAY = 1.0
+HOST_DELAYS = {
+    'www.basketball-reference.com': 3.0
+}
+MAX_WORKERS = 4
+
+# Run any script with --offline (or OFFLINE=1) to serve every page from the cache and never touch the network
+OFFLINE = '--offline' in sys.argv or os.environ.get('OFFLINE', '') not in ('', '0')
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class HostRateLimiter:
+    def __init__(self, delay=HOST_DELAY):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def host_delay(self, host):
+        return HOST_DELAYS.get(host, self.delay)
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+
+        # Reserve the next free slot for this host under the lock, then sleep outside it so other hosts aren't blocked
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.host_delay(host)
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Used by get() when the caller doesn't pass a limiter, so one-off requests (e.g. pipeline.py's source probes) are paced too
+default_limiter = HostRateLimiter()
+
+session = None
+
+def get_session():
+    global session
+    if session is None:
+        retry = Retry(total=4, backoff_factor=1.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET', 'HEAD'])
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    return session
+
+
+class CachedResponse:
+    def __init__(self, url, status_code, headers, content, encoding, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def index_path(url):
+    return os.path.join(CACHE_DIR, 'index', f"{url_key(url)}.json")
+
+
+def object_path(digest):
+    # Bodies are stored by content hash, so identical pages fetched from different URLs (or re-fetched unchanged) share one file
+    return os.path.join(CACHE_DIR, 'objects', digest[:2], digest)
+
+
+def read_entry(url):
+    try:
+        with open(index_path(url), 'r') as f:
+            entry = json.load(f)
+        with open(object_path(entry['content_hash']), 'rb') as f:
+            content = f.read()
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None, None
+
+    return entry, content
+
+
+def atomic_write(filename, data):
+    # Each write gets its own temp file: get_many and the thread pools can write the same body (identical 404 pages)
+    # or the same url's entry at once, and a shared temp name would let one writer truncate or move another's file
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(filename), prefix=os.path.basename(filename) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, filename)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def write_entry(url, status_code, headers, content, encoding):
+    digest = content_hash(content)
+
+    body_file = object_path(digest)
+    if not os.path.exists(body_file):
+        atomic_write(body_file, content)
+
+    entry = {
+        'url': url,
+        'status_code': status_code,
+        # Stored lowercased: servers don't agree on header case, and lookups below are by lowercase name
+        'headers': {k.lower(): v for k, v in headers.items() if k.lower() in ('etag', 'last-modified', 'content-type')},
+        'encoding': encoding,
+        'content_hash': digest,
+        'fetched_at': time.time()
+    }
+
+    atomic_write(index_path(url), json.dumps(entry).encode('utf-8'))
+    return entry
+
+
+def touch_entry(url, entry):
+    entry['fetched_at'] = time.time()
+    atomic_write(index_path(url), json.dumps(entry).encode('utf-8'))
+
+
+def from_entry(entry, content):
+    return CachedResponse(entry['url'], entry['status_code'], CaseInsensitiveDict(entry['headers']), content, entry['encoding'], from_cache=True)
+
+
+def is_fresh(entry, ttl):
+    return ttl is None or (time.time() - entry['fetched_at']) < ttl
+
+
+def get(url, ttl=DEFAULT_TTL, session=None, limiter=None, **kwargs):
+    host = urlparse(url).netloc
+    entry, content = read_entry(url)
+
+    if entry and (OFFLINE or is_fresh(entry, ttl)):
+        metrics.increment('fetch_requests', host=host, cache='hit')
+        return from_entry(entry, content)
+
+    if OFFLINE:
+        metrics.increment('fetch_requests', host=host, cache='offline_miss')
+        raise CacheMiss(f"{url} is not in the cache and --offline was set")
+
+    # Stale entry: revalidate with the validators the server gave us last time rather than re-downloading the page
+    headers = dict(kwargs.pop('headers', {}))
+    if entry:
+        # Entries written before header names were lowercased can still have them in the server's case
+        validators = CaseInsensitiveDict(entry['headers'])
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last-modified' in validators:
+            headers['If-Modified-Since'] = validators['last-modified']
+
+    with metrics.timer('fetch_throttle', host=host):
+        (limiter or default_limiter).wait(url)
+
+    kwargs.pop('stream', None)
+    with metrics.timer('fetch', host=host):
+        r = (session or get_session()).get(url, headers=headers, **kwargs)
+    metrics.increment('fetch_bytes', len(r.content), host=host)
+
+    if r.status_code == 304 and entry:
+        metrics.increment('fetch_requests', host=host, cache='revalidated', status=304)
+        touch_entry(url, entry)
+        return from_entry(entry, content)
+
+    metrics.increment('fetch_requests', host=host, cache='miss', status=r.status_code)
+
+    # Don't cache server errors, but do keep 404s so photo probes aren't repeated on every run
+    if r.status_code >= 500:
+        return CachedResponse(url, r.status_code, dict(r.headers), r.content, r.encoding, from_cache=False)
+
+    entry = write_entry(url, r.status_code, r.headers, r.content, r.encoding)
+    return CachedResponse(url, r.status_code, CaseInsensitiveDict(entry['headers']), r.content, r.encoding, from_cache=False)
+
+
+def get_rendered(url, render, ttl=DEFAULT_TTL):
+    # Same cache, for pages loaded through something other than requests (e.g. a selenium driver). render(url) returns the page HTML.
+    entry, content = read_entry(url)
+
+    host = urlparse(url).netloc
+    if entry and (OFFLINE or is_fresh(entry, ttl)):
+        metrics.increment('fetch_requests', host=host, cache='hit')
+        return from_entry(entry, content)
+
+    if OFFLINE:
+        metrics.increment('fetch_requests', host=host, cache='offline_miss')
+        raise CacheMiss(f"{url} is not in the cache and --offline was set")
+
+    with metrics.timer('fetch', host=host, renderer='browser'):
+        content = render(url).encode('utf-8')
+    metrics.increment('fetch_requests', host=host, cache='miss', status=200)
+    metrics.increment('fetch_bytes', len(content), host=host)
+    entry = write_entry(url, 200, {}, content, 'utf-8')
+    return from_entry(entry, content)
+
+
+def get_many(urls, ttl=DEFAULT_TTL, max_workers=MAX_WORKERS, delay=HOST_DELAY, **kwargs):
+    # Fetch urls on a bounded thread pool sharing one session and one per-host rate limit. Responses come back in the same order as urls.
+    limiter = HostRateLimiter(delay)
+    session = get_session()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda url: get(url, ttl=ttl, session=session, limiter=limiter, **kwargs), urls))
@@ -0,0 +1,131 @@
+import csv
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date as Date, timedelta
+
+import numpy as np
+
+import records
+from aggregates import build_events
+from artifacts import write_if_changed
+
+
+# Team-to-team player flow: how many players moved from each node to each other node (teams plus the FA and RET pools)
+# and how much salary went with them, per period. Each pair's values are stored as running totals over the periods, so
+# the flow over any date range is a difference of two entries (flow_totals) instead of a pass over transactions.json.
+# The map doesn't draw flows yet, so the file is only written to data/, not published.
+#
+#   {"period": "date", "periods": [first date of each period],
+#    "nodes": [{"team_id", "latitude", "longitude"}],
+#    "flows": [{"from", "to", "source": [lon, lat], "target": [lon, lat], "count": [...], "salary": [...]}]}
+#
+# from/to index nodes, and source/target are the arc endpoints from team_data.csv (null for FA/RET, which have no
+# location). Only pairs with at least one move are listed. Moves that leave a player on the same team (extensions,
+# options) aren't flows. A move's salary is the player's salary after it, carried forward the same way as in aggregates.py.
+
+POOLS = ['FA', 'RET']
+
+
+def week_of(date):
+    day = Date.fromisoformat(date)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+PERIODS = {
+    "date": lambda date: date,
+    "week": week_of,
+    "month": lambda date: date[:7]
+}
+
+
+def load_nodes(team_file):
+    with open(team_file, 'r', encoding='utf-8-sig') as f:
+        teams = [x for x in csv.DictReader(f) if x['team_id'] not in POOLS]
+
+    coordinate = lambda value: float(value) if value else None
+    return [{"team_id": x['team_id'], "latitude": coordinate(x['latitude']), "longitude": coordinate(x['longitude'])} for x in teams] + \
+        [{"team_id": x, "latitude": None, "longitude": None} for x in POOLS]
+
+
+def flow_grids(players, transactions, nodes, period='date'):
+    # Returns (period labels, node ids, count grid, salary grid), grids shaped [from node, to node, period] and cumulative over periods
+    dates, team_ids, events = build_events(players, transactions)
+
+    node_ids = [x['team_id'] for x in nodes] + [x for x in team_ids if x not in set(x['team_id'] for x in nodes)]
+    node_of_team = np.array([node_ids.index(x) for x in team_ids])
+
+    periods = sorted(set(PERIODS[period](x) for x in dates[1:]))
+    # dates[0] (None) is the starting rosters, which are never a move's date
+    period_of_date = np.array([0] + [periods.index(PERIODS[period](x)) for x in dates[1:]])
+
+    # Group each player's events together, keeping transaction order, and carry salaries forward as aggregates.team_series does
+    order = np.argsort(events['player'], kind='stable')
+    player, date, team, salary = (events[x][order] for x in ['player', 'date', 'team', 'salary'])
+    defined = np.where(~np.isnan(salary), np.arange(len(salary)), 0)
+    salary = salary[np.maximum.accumulate(defined)]
+
+    # Every event after a player's first is a move from the team of the event before it
+    moved = np.append(False, (player[1:] == player[:-1]) & (team[1:] != team[:-1]))
+    from_node = node_of_team[np.append(0, team[:-1])][moved]
+    to_node = node_of_team[team][moved]
+    move_period = period_of_date[date][moved]
+
+    counts = np.zeros((len(node_ids), len(node_ids), len(periods)))
+    salaries = np.zeros((len(node_ids), len(node_ids), len(periods)))
+    np.add.at(counts, (from_node, to_node, move_period), 1)
+    np.add.at(salaries, (from_node, to_node, move_period), salary[moved])
+
+    return periods, node_ids, np.cumsum(counts, axis=2), np.cumsum(salaries, axis=2)
+
+
+def build_flows(players, transactions, nodes, period='date'):
+    periods, node_ids, counts, salaries = flow_grids(players, transactions, nodes, period)
+    nodes = nodes + [{"team_id": x, "latitude": None, "longitude": None} for x in node_ids[len(nodes):]]
+    endpoint = lambda node: [node['longitude'], node['latitude']] if node['latitude'] is not None else None
+
+    flows = []
+    if not periods:
+        return {"period": period, "periods": periods, "nodes": nodes, "flows": flows}
+
+    for i, j in zip(*np.nonzero(counts[:, :, -1])):
+        flows.append({
+            "from": int(i),
+            "to": int(j),
+            "source": endpoint(nodes[i]),
+            "target": endpoint(nodes[j]),
+            "count": [int(x) for x in np.rint(counts[i, j])],
+            "salary": [int(x) for x in np.rint(salaries[i, j])]
+        })
+
+    return {"period": period, "periods": periods, "nodes": nodes, "flows": flows}
+
+
+def period_range(data, start_date=None, end_date=None):
+    # Periods [lo, hi) overlapping the date range. Dates are compared by the period they fall in, so with week/month
+    # periods a range that starts partway into one still includes all of it.
+    label = PERIODS[data['period']]
+    lo = 0 if start_date is None else bisect_left(data['periods'], label(start_date))
+    hi = len(data['periods']) if end_date is None else bisect_right(data['periods'], label(end_date))
+    return lo, hi
+
+
+def flow_totals(data, start_date=None, end_date=None):
+    # [(from team_id, to team_id, count, salary)] over the date range, both ends inclusive
+    lo, hi = period_range(data, start_date, end_date)
+    if hi <= lo:
+        return []
+
+    totals = []
+    for flow in data['flows']:
+        count = flow['count'][hi - 1] - (flow['count'][lo - 1] if lo else 0)
+        if count:
+            salary = flow['salary'][hi - 1] - (flow['salary'][lo - 1] if lo else 0)
+            totals.append((data['nodes'][flow['from']]['team_id'], data['nodes'][flow['to']]['team_id'], count, salary))
+
+    return totals
+
+
+def write_flows(players_file, team_file, transactions, out_files, period='date'):
+    data = json.dumps(build_flows(records.load_players(players_file), transactions, load_nodes(team_file), period), separators=(',', ':'))
+    for filename in out_files:
+        write_if_changed(filename, data)
@@ -1,49 +1,109 @@
+import argparse
 import csv
-import requests
-from bs4 import BeautifulSoup
-import unidecode
 
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
+import fetch
+import metrics
+import positions
+import records
+from parsing import extract_element, parse_element, require_element
 
-from collections import Counter
 
-
-with open('../data/players.csv', 'r', encoding='utf-8-sig') as f:
-    player_dict = { x['player_id']: x for x in csv.DictReader(f) }
+player_dict = records.load_players('../data/players.csv')
 
 with open('../data/team_data.csv', 'r', encoding='utf-8-sig') as f:
     teams = [x for x in csv.DictReader(f)]
 
 
-chrome_options = webdriver.ChromeOptions()
+parser = argparse.ArgumentParser()
+parser.add_argument('--browser', action='store_true', help="Load every contract page through headless Chrome instead of fetching the archived HTML directly")
+args, _ = parser.parse_known_args()
+
+metrics.start('initial_rosters')
+
+# Only start the browser (and only import selenium) if a contract page actually needs it
+driver = None
+
+def render_page(url):
+    global driver
+    if driver is None:
+        from selenium import webdriver
+
+        chrome_options = webdriver.ChromeOptions()
+        chrome_options.add_argument("enable-automation")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument('--headless')
+
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.implicitly_wait(20)
+
+    driver.get(url)
+    return driver.page_source
+
+
+def contract_url(team_id, raw=False):
+    # The id_ flag asks the wayback machine for the page exactly as archived, without its toolbar/script rewriting
+    return f"http://web.archive.org/web/20201004080457{'id_' if raw else ''}/https://www.basketball-reference.com/contracts/{team_id}.html"
+
+
+def get_contract_tables(team_ids):
+    contract_tables = {}
+
+    if not args.browser:
+        for team_id, r in zip(team_ids, fetch.get_many([contract_url(x, raw=True) for x in team_ids], ttl=None)):
+            contract_tables[team_id] = parse_element(r.text, "table", {"id": "contracts"}) if r.ok else None
 
-chrome_options.add_argument("enable-automation")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument('--headless')
+    # Fall back to the browser for any page that didn't come through with its contracts table
+    for team_id in team_ids:
+        if contract_tables.get(team_id) is None:
+            r = fetch.get_rendered(contract_url(team_id), render_page, ttl=None)
+            contract_tables[team_id] = parse_element(r.text, "table", {"id": "contracts"})
+
+    return contract_tables
+
+
+def check_parity(player_dict, filename='../data/players_start.csv'):
+    # Compare the rebuilt rosters against the previous players_start.csv before it's overwritten
+    try:
+        with open(filename, 'r', encoding='utf-8-sig') as f:
+            previous = {x['player_id']: x for x in csv.DictReader(f)}
+    except FileNotFoundError:
+        return
+
+    differences = []
+    for player_id, player in player_dict.items():
+        old_player = previous.get(player_id)
+        if not old_player:
+            differences.append((player_id, 'missing from previous file', '', ''))
+            continue
+
+        for field in ['team_id', '2021_preseason_salary', 'position']:
+            if player.formatted(field) != old_player.get(field, ''):
+                differences.append((player_id, field, old_player.get(field, ''), player.formatted(field)))
+
+    differences += [(x, 'missing from new file', '', '') for x in previous.keys() if x not in player_dict]
+
+    print(f"Parity check against {filename}: {len(differences)} differences")
+    for difference in differences:
+        print('  ', *difference)
 
-driver = webdriver.Chrome(options=chrome_options)
-driver.implicitly_wait(20)
 
 for player_id, player in player_dict.items():
-    player_dict[player_id]['team_id'] = 'FA'
+    player.team_id = 'FA'
 
 option_contracts = []
+contract_tables = get_contract_tables([team['team_id'] for team in teams])
 for team in teams:
     team_id = team['team_id']
 
-    driver.get(f"http://web.archive.org/web/20201004080457/https://www.basketball-reference.com/contracts/{team_id}.html")
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-
-    salary_table = soup.find("table", attrs={"id": "contracts"}).find("tbody")
+    salary_table = contract_tables[team_id].find("tbody")
     rows = salary_table.find_all("tr", class_=lambda x: not x)
     for row in rows:
         player_id = row.find("th")['csk']
         
         try:
             y2_salary = row.find_all("td")[2]
-            player_dict[player_id]['2021_preseason_salary'] = y2_salary['csk']
-            player_dict[player_id]['team_id'] = team_id
+            player_dict[player_id].preseason_salary = records.parse_int(y2_salary['csk'])
+            player_dict[player_id].team_id = team_id
 
             if 'salary-pl' in y2_salary['class'] or 'salary-tm' in y2_salary['class']:
                 option_contracts.append(player_id)
@@ -51,12 +111,12 @@ for team in teams:
         except KeyError:
             pass
 
-driver.quit()
+if driver:
+    driver.quit()
 
 # 2019-20 Retirements
-r = requests.get('https://www.basketball-reference.com/leagues/NBA_2020_transactions.html')
-soup = BeautifulSoup(r.text, 'html.parser')
-content = soup.find("div", attrs={"id": "content"}).find("ul", attrs={"class": "page_index"})
+r = fetch.get('https://www.basketball-reference.com/leagues/NBA_2020_transactions.html', ttl=None)
+content = require_element(extract_element(r.text, "div", {"id": "content"}), "ul", {"class": "page_index"})
 
 transaction_dates = content.find_all("li")
 for date in transaction_dates:
@@ -69,30 +129,31 @@ for date in transaction_dates:
             player_id = transaction.find('a')['href'].split('/')[-1].strip('.html')
             
             if player_id in player_dict.keys():
-                player_dict[player_id]['team_id'] = 'RET'
+                player_dict[player_id].team_id = 'RET'
 
 # Positions
+# A player's position comes from the newest season in players.csv that lists one. Players with no position in any
+# season's stats are looked up on their own page, all at once (see positions.py)
+seasons = next(iter(player_dict.values())).schema.seasons()
+season_position = lambda player: next((player.get(f'{year}_pos') for year in reversed(seasons) if player.get(f'{year}_pos') != ''), '')
+
+missing_positions = [player_id for player_id, player in player_dict.items() if season_position(player) == '']
+fallback_positions, position_errors = positions.resolve_positions(missing_positions)
+
 for player_id, player in player_dict.items():
-    if player['2021_pos'] != '':
-        player_dict[player_id]['position'] = player['2021_pos']
-    elif player['2020_pos'] != '':
-        player_dict[player_id]['position'] = player['2020_pos']
-    else:
-        r = requests.get(f"https://www.basketball-reference.com/players/{player_id[0]}/{player_id}.html")
-        soup = BeautifulSoup(r.text, 'html.parser')
+    player.position = season_position(player) or fallback_positions.get(player_id, '-')
+
+if position_errors:
+    print(f"No position found for {len(position_errors)} players, using '-':")
+    for player_id, error in sorted(position_errors.items()):
+        print('  ', player_id, error)
 
-        try:
-            table = soup.find("table", attrs={"id": "per_game"}).find("tbody")
-            player_dict[player_id]['position'] = table.find_all("td", attrs={"data-stat": "pos"})[-1].text
-        except:
-            player_dict[player_id]['position'] = '-'
 
+check_parity(player_dict)
 
-for filename in ['../data/players_start.csv', '../../public/data/players_start.csv']:
-    with open(filename, 'w') as f:
-        out_data = list(player_dict.values())
+# players.csv has no preseason salary or position columns, so they're added to the end
+schema = next(iter(player_dict.values())).schema
+schema.add_field('2021_preseason_salary')
+schema.add_field('position')
 
-        out_csv = csv.DictWriter(f, fieldnames=list(out_data[0].keys()))
-        out_csv.writeheader()
-        for row in out_data:
-            out_csv.writerow(row)
+records.write_players(player_dict.values(), ['../data/players_start.csv', '../../public/data/players_start.csv'])
@@ -1,20 +1,14 @@
-import requests
-import csv
-import unidecode
-import shutil
+import os
 
-with open('../data/players.csv', 'r', encoding='utf-8-sig') as f:
-    players = [x for x in csv.DictReader(f)]
-    new_photo_players = [x for x in players if 'jpg' in x['internal_image_link']]
+import photos
+import records
 
-for player in new_photo_players:
-    formatted_player_name = unidecode.unidecode(player['player'].replace(' ', '-').replace('\'','').replace('.',''))
-    image_url = f"https://www.2kratings.com/wp-content/uploads/{formatted_player_name}-2K-Rating.png"
+PHOTO_DIR = '../../public/images/player_photos'
 
-    r = requests.get(image_url, stream=True)
-    if r.status_code == 200:
-        with open(f"../data/new_images/{player['player_id']}.png", 'wb') as f:
-            r.raw.decode_content = True
-            shutil.copyfileobj(r.raw, f) 
+players = records.load_players('../data/players.csv')
 
-# print(len(new_photo_players))
\ No newline at end of file
+# Only players without a published photo: optimize_photos.py prefers new_images over the curated photos, so
+# downloading everyone would replace every curated photo on the next run
+new_photo_players = [x for x in players.values() if not os.path.exists(os.path.join(PHOTO_DIR, f"{x.player_id}.png"))]
+
+photos.download_photos(new_photo_players, '../data/new_images')
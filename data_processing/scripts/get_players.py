@@ -1,10 +1,36 @@
-import csv
-import shutil
-import os
-from os import path
-import requests
-from bs4 import BeautifulSoup
-import unidecode
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import fetch
+import metrics
+import photos
+import records
+from parsing import parse_element
+
+
+STAT_URLS = ["https://www.basketball-reference.com/leagues/NBA_{}_per_game.html", "https://www.basketball-reference.com/leagues/NBA_{}_advanced.html"]
+
+# Past seasons' salaries come from archived copies of the contracts page. The live page always shows the current
+# season, which is taken to be the last one requested.
+archived_contract_link_data = {
+    '2020': {
+        "link": "http://web.archive.org/web/20201012190231/https://www.basketball-reference.com/contracts/players.html",
+        "table_index": 0
+    }
+}
+
+current_contract_link_data = {
+    "link": "https://www.basketball-reference.com/contracts/players.html",
+    "table_index": 0
+}
+
+
+def contract_link_data(years):
+    # {year: {link, table_index}} for the years that have a contracts page
+    links = {str(year): archived_contract_link_data[str(year)] for year in years if str(year) in archived_contract_link_data}
+    if years and str(max(years)) not in links:
+        links[str(max(years))] = current_contract_link_data
+    return links
 
 
 def process_player_row(row, year):
@@ -12,88 +38,89 @@ def process_player_row(row, year):
     return player_data
 
 
-# def get_player_data(player_id):
-#     r = requests.get(f"https://www.basketball-reference.com/players/t/{player_id}.html")
-#     soup = BeautifulSoup(r.text, "html.parser")
+# The parse_* functions run in worker processes, so they take page text and return plain (player_id, data) tuples
+# rather than soup objects
 
+def parse_stats_page(html, year):
+    # Only the first stats tbody gets parsed, not the whole page
+    rows = parse_element(html, "tbody").find_all("tr", attrs={"class": "full_table"})
+    return [(row.find_all("td")[0]['data-append-csv'], process_player_row(row, year)) for row in rows]
 
-player_dict = {}
 
-# Get active player stat data for players in current and previous year
-for base_url in ["https://www.basketball-reference.com/leagues/NBA_{}_per_game.html", "https://www.basketball-reference.com/leagues/NBA_{}_advanced.html"]:
-    for year in [2020, 2021]:
-        r = requests.get(base_url.format(year))
-        soup = BeautifulSoup(r.text, "html.parser")
-        table = soup.find("table", attrs={"id": "advanced_stats"})
+def parse_contracts_page(html, table_index):
+    contracts = parse_element(html, "table", index=table_index).find("tbody")
+    parsed = []
+    for row in contracts.find_all("tr", class_=lambda x: not x):
+        cells = row.find_all("td")
+        parsed.append((cells[0]['data-append-csv'], cells[0].find_all("a")[-1].text, cells[1].find("a").text, cells[2].get('csk', '0')))
 
-        rows = soup.find("tbody").find_all("tr", attrs={"class": "full_table"})
-        for row in rows:
-            player_id = row.find_all("td")[0]['data-append-csv']
-            player_data = process_player_row(row, year)
-            player_data['player_id'] = player_id
-            player_dict[player_id] = player_dict.get(player_id, {}) | player_data
+    return parsed
 
 
-contract_link_data = {
-    '2020': {
-        "link": "http://web.archive.org/web/20201012190231/https://www.basketball-reference.com/contracts/players.html",
-        "table_index": 0
-    },
-    '2021': {
-        "link": "https://www.basketball-reference.com/contracts/players.html",
-        "table_index": 0
-    }
-}
+# def get_player_data(player_id):
+#     r = requests.get(f"https://www.basketball-reference.com/players/t/{player_id}.html")
+#     soup = BeautifulSoup(r.text, "html.parser")
 
-for year, parse_data in contract_link_data.items():
-    print(year, parse_data)
-    r = requests.get(parse_data["link"], allow_redirects=False)
-    soup = BeautifulSoup(r.text, "html.parser")
-
-    contracts = soup.find_all('table')[parse_data["table_index"]].find("tbody")
-    rows = contracts.find_all("tr", class_=lambda x: not x)
-    for row in rows:
-        player_id = row.find("td")['data-append-csv']
-
-        if player_id not in player_dict.keys():
-            player_dict[player_id] = {
-                'player_id': player_id,
-                'player': row.find("td").find_all("a")[-1].text,
-                'team_id': row.find_all("td")[1].find("a").text
-                }
-        try:
-            player_dict[player_id][f'{year}_salary'] = row.find_all("td")[2]['csk']
-        except KeyError:
-            player_dict[player_id][f'{year}_salary'] = '0'
-
-
-# Get player photos
-for player_id, player in player_dict.items():
-    print(player_id)
-    # image_url = f"https://www.basketball-reference.com/req/202101021/images/players/{player_id}.jpg"
-    formtted_player_name = unidecode.unidecode(player['player'].replace(' ', '-').replace('\'','').replace('.',''))
-    image_url = f"https://www.2kratings.com/wp-content/uploads/{formtted_player_name}-2K-Rating.png"
-
-    r = requests.get(image_url, stream=True)
-    if r.status_code == 200:
-        player_dict[player_id]['img_link'] = image_url
-        # player_dict[player_id]['internal_image_link'] = f"/images/{player_id}.png"
-        # if not path.exists(f"../../public/images/{player_id}.png"):
-        #     with open(f"../new_images/{player_id}.png", 'wb') as f:
-        #         r.raw.decode_content = True
-        #         shutil.copyfileobj(r.raw, f) 
-    else:
-        player_dict[player_id]['img_link'] = f"https://www.basketball-reference.com/req/202101021/images/players/{player_id}.jpg"
-        # player_dict[player_id]['internal_image_link'] = f"/images/{player_id}.jpg"
-        
-
-for filename in ['../data/players.csv']:
-    with open(filename, 'w') as f:
-        out_data = list(player_dict.values())
-
-        out_csv = csv.DictWriter(f, fieldnames=list(out_data[0].keys()))
-        out_csv.writeheader()
-
-        for row in out_data:
-            out_csv.writerow(row)
 
+def scrape_player_data(years, max_workers=None):
+    # Every page is fetched up front (concurrently, within fetch's per-host rate limit), then parsed on a process pool
+    stat_pages = [(base_url.format(year), year) for base_url in STAT_URLS for year in years]
+    contract_links = contract_link_data(years)
+    contract_pages = [(contract_links[str(year)], str(year)) for year in years if str(year) in contract_links]
+    for year in years:
+        if str(year) not in contract_links:
+            print(f"No contracts page for {year}, skipping {year}_salary")
+
+    with metrics.timer('fetch_pages'):
+        stat_responses = fetch.get_many([url for url, _ in stat_pages])
+        contract_responses = fetch.get_many([parse_data["link"] for parse_data, _ in contract_pages], allow_redirects=False)
+
+    # Parse timings inside the worker processes aren't collected, so the pool is timed as a whole
+    with metrics.timer('parse_pool'), ProcessPoolExecutor(max_workers=max_workers) as executor:
+        stat_rows = executor.map(parse_stats_page, [r.text for r in stat_responses], [year for _, year in stat_pages])
+        contract_rows = executor.map(parse_contracts_page, [r.text for r in contract_responses], [parse_data["table_index"] for parse_data, _ in contract_pages])
+
+        # Single merge pass, in page order (per_game before advanced, older seasons first), updating each player's dict in place
+        player_dict = {}
+        for rows in stat_rows:
+            for player_id, player_data in rows:
+                player = player_dict.setdefault(player_id, {})
+                player.update(player_data)
+                player['player_id'] = player_id
+
+        for (_, year), rows in zip(contract_pages, contract_rows):
+            for player_id, player, team_id, salary in rows:
+                if player_id not in player_dict:
+                    player_dict[player_id] = {'player_id': player_id, 'player': player, 'team_id': team_id}
+                player_dict[player_id][f'{year}_salary'] = salary
+
+    return player_dict
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--start-year', type=int, default=2020, help="First season (by end year) to pull stats/salaries for")
+    parser.add_argument('--end-year', type=int, default=2021, help="Last season, inclusive")
+    parser.add_argument('--workers', type=int, default=None, help="Parser processes (defaults to the CPU count)")
+    args, _ = parser.parse_known_args()
+
+    metrics.start('players')
+
+    # Get active player stat data and salaries for every season in the range
+    scraped = scrape_player_data(range(args.start_year, args.end_year + 1), max_workers=args.workers)
+    player_dict = records.players_from_rows(list(scraped.values()))
+    next(iter(player_dict.values())).schema.add_field('img_link')
+
+    # Get player photos (probed concurrently; known photos are revalidated by ETag, see photos.needs_probe)
+    photo_manifest = photos.resolve_photos(player_dict.values())
+    for player_id, player in player_dict.items():
+        # image_url = f"https://www.basketball-reference.com/req/202101021/images/players/{player_id}.jpg"
+        if photo_manifest.get(player_id, {}).get('status') == 200:
+            player.img_link = photo_manifest[player_id]['url']
+            # player_dict[player_id]['internal_image_link'] = f"/images/{player_id}.png"
+        else:
+            player.img_link = f"https://www.basketball-reference.com/req/202101021/images/players/{player_id}.jpg"
+            # player_dict[player_id]['internal_image_link'] = f"/images/{player_id}.jpg"
+
+
+    records.write_players(player_dict.values(), ['../data/players.csv'])
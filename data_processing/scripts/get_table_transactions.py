@@ -1,22 +1,48 @@
+import argparse
 import json
-import requests
 from bs4 import BeautifulSoup
 
+import fetch
+import metrics
+from artifacts import write_if_changed
+from parsing import parse_element
 
-base_url = "https://www.prosportstransactions.com/basketball/Search/SearchResults.php?BeginDate=2020-10-11&PlayerMovementChkBx=yes"
-r = requests.get(base_url)
-soup = BeautifulSoup(r.text, 'html.parser')
-num_pages = int(soup.find_all("p", attrs={"class": "bodyCopy"})[-2].find_all("a")[-1].text)
-print(num_pages)
 
-transactions = []
+# Results are searched from BeginDate onwards and listed oldest first, 25 rows to a page. By default only the newest
+# date already in OUT_FILE onwards is re-requested: that date is searched again because it may have been only partly
+# posted last time, and rows already stored are dropped when merging, so old rows are never re-crawled. A daily update
+# is then a page or two instead of the whole season. --full re-crawls from SEASON_START and replaces the file.
 
-for page_num in range(0, num_pages):
-    url = base_url + f"&start={page_num*25}"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.text, "html.parser")
+SEASON_START = "2020-10-11"
+OUT_FILE = '../data/supplementary_transaction_data.json'
+
+
+def search_url(begin_date=SEASON_START):
+    return f"https://www.prosportstransactions.com/basketball/Search/SearchResults.php?BeginDate={begin_date}&PlayerMovementChkBx=yes"
+
+
+BASE_URL = search_url()
+
+
+def page_count(html):
+    # A single page of results has no page links
+    soup = BeautifulSoup(html, 'html.parser')
+    paragraphs = soup.find_all("p", attrs={"class": "bodyCopy"})
+    links = paragraphs[-2].find_all("a") if len(paragraphs) >= 2 else []
+    page_numbers = [int(x.text) for x in links if x.text.strip().isdigit()]
+    return max(page_numbers, default=1)
+
+
+def page_urls(num_pages, begin_date=SEASON_START):
+    return [search_url(begin_date) + f"&start={page_num*25}" for page_num in range(0, num_pages)]
+
+
+def parse_rows(html):
+    transactions = []
+    table = parse_element(html, "table", {"class": "datatable"})
+    if not table:
+        return transactions
 
-    table = soup.find("table", attrs={"class": "datatable"})
     rows = table.find_all("tr", class_=lambda x: not x)
     for row in rows:
         row_data = [x.text for x in row.find_all("td")]
@@ -30,7 +56,7 @@ for page_num in range(0, num_pages):
         or 'promoted' in row_data[4].lower()
         or '2020 NBA draft' in row_data[4]):
             continue
-            
+
         # Correcting a mis-dated Blake Griffin transaction
         if row_data[4].strip() == "signed free agent to a 1-year (remainder of the season) $1.23M contract":
             transaction_date = "2021-03-08"
@@ -45,6 +71,61 @@ for page_num in range(0, num_pages):
             "notes": row_data[4].strip()
         })
 
+    return transactions
+
+
+def row_key(transaction):
+    return (transaction["date"], transaction["team"], tuple(transaction["acquired"]), tuple(transaction["relinquished"]), transaction["notes"])
+
+
+def load_existing(filename=OUT_FILE):
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def last_seen_date(transactions):
+    return max((x["date"] for x in transactions), default=None)
+
+
+def scrape(begin_date=SEASON_START):
+    # Every page is revalidated (ttl=0): these are the newest rows, which the pipeline only knows have changed from the
+    # whole-season search, so a cached copy of the bounded search could be stale. An unchanged page costs a 304.
+    r = fetch.get(search_url(begin_date), ttl=0)
+    num_pages = page_count(r.text)
+    print(f"{num_pages} page(s) from {begin_date}")
+
+    # The first page is already in hand; the rest are fetched concurrently and come back in page order, so rows keep
+    # the site's ordering
+    transactions = parse_rows(r.text)
+    for r in fetch.get_many(page_urls(num_pages, begin_date)[1:], ttl=0):
+        transactions += parse_rows(r.text)
+
+    metrics.increment('table_pages', num_pages)
+    return transactions
+
+
+def merge(existing, scraped):
+    # Scraped rows all fall on or after the newest stored date, so appending the unseen ones keeps the file in site order
+    seen = set(row_key(x) for x in existing)
+    new_rows = [x for x in scraped if row_key(x) not in seen]
+    return existing + new_rows, new_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--full', action='store_true', help="Re-crawl every page since SEASON_START instead of only rows newer than the stored ones")
+    args, _ = parser.parse_known_args()
+
+    metrics.start('table_transactions')
+
+    existing = [] if args.full else load_existing()
+    begin_date = last_seen_date(existing) or SEASON_START
+
+    transactions, new_rows = merge(existing, scrape(begin_date))
+    metrics.increment('table_rows', len(new_rows), outcome='new')
+    print(f"{len(new_rows)} new row(s), {len(transactions)} total")
 
-with open('../data/supplementary_transaction_data.json', 'w') as f:
-    json.dump(transactions, f)
\ No newline at end of file
+    write_if_changed(OUT_FILE, json.dumps(transactions))
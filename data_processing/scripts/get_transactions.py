@@ -1,342 +1,90 @@
-import csv
+import argparse
 import json
-from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
 
+import aggregates
+import artifacts
+import columnar
+import fetch
+import flows
+import metrics
+import records
+import snapshots
+import transaction_stream
+from transaction_builder import BuildContext, DedupIndex, build_transactions, load_players, load_prosports_transactions, load_team_data
+from transaction_builder.checkpoints import load_checkpoint, reset_checkpoint, save_checkpoint
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--seasons', nargs='+', type=int, default=[2021], help="Seasons to build, in order. Each season starts from the previous season's ending rosters.")
+parser.add_argument('--fresh', action='store_true', help="Ignore existing checkpoints and replay every season from players_start.csv")
+parser.add_argument('--output', choices=['json', 'ndjson', 'both'], default='json', help="json: transactions.json and the artifacts built from it. ndjson: only the month-partitioned transactions/ directories (see transaction_stream.py), streamed a date at a time without holding every transaction in memory. both: all of it.")
+args, _ = parser.parse_known_args()
+
+metrics.start('transactions')
+
+collect = args.output in ('json', 'both')
+stream = transaction_stream.PartitionedWriter(['../data/transactions', '../../public/data/transactions']) if args.output in ('ndjson', 'both') else None
+all_transactions = []
 
-def process_multi_team(transaction_element):
-    all_links = transaction_element.find_all("a")
-
-    breakpoints = []
-    for i, link in enumerate(all_links):
-        if 'data-attr-from' in link.attrs:
-            breakpoints.append(i)
-    
-    players = []
-    for i, point in enumerate(breakpoints):
-        if i == len(breakpoints)-1:
-            link_chunk = all_links[point:]
-        else:
-            link_chunk = all_links[point:breakpoints[i+1]]
-        
-        players += process_trade(link_chunk)
-    
-    return players
-
-
-def process_trade(links):
-    players = []
-
-    for i, link in enumerate(links):
-        if 'data-attr-from' in link.attrs:
-            from_team_id = link['data-attr-from']
-            from_team_index = i
-        elif 'data-attr-to' in link.attrs:
-            to_team_id = link['data-attr-to']
-            to_team_index = i
-    
-    for link in links[from_team_index+1:to_team_index]:
-        player_id = link['href'].split('/')[-1].replace('.html', '')
-        if player_id in player_dict.keys():
-            players.append({
-                "player_id": player_id,
-                "from_team": player_dict[player_id]['team_id'],
-                "to_team": to_team_id
-            })
-
-    for link in links[to_team_index+1:]:
-        player_id = link['href'].split('/')[-1].replace('.html', '')
-        if player_id in player_dict.keys():
-            players.append({
-                "player_id": player_id,
-                "from_team": player_dict[player_id]['team_id'],
-                "to_team": from_team_id
-            })
-
-    return players
-
-
-def format_transaction_id(transaction_type, formatted_date, player_data):
-    return f"{transaction_type}_{formatted_date}_{'-'.join(sorted([x['player_id'] for x in player_data]))}"
-    
-
-def process_bbref_transaction(transaction, transaction_text):
-    # For now, filter out G-League assignments/recalls
-    if ' recalled ' in transaction_text or ' assigned ' in transaction_text:
-        return
-
-    for phrase in transaction_types:
-        if phrase in transaction_text:
-            transaction_type = phrase
-            break
-    
-    player_data = []
-
-    if transaction_type == "signed" or transaction_type == "claimed" or transaction_type == "contract extension":
-        player_id = transaction.find_all("a")[-1]['href'].split('/')[-1].replace('.html', '')
-
-        # Transaction logs don't specify two-way contracts on waiver claims, so filter these and continue here
-        if player_id not in player_dict.keys():
-            return
-
-        to_team = transaction.find_all("a")[0]['href'].split('/')[2]
-        player_movement = {
-            "player_id": player_id,
-            "from_team": player_dict[player_id]['team_id'],
-            "to_team": to_team,
-        }
-        player_data = [player_movement]
-
-    elif transaction_type == "waived":
-        player_id = transaction.find_all("a")[-1]['href'].split('/')[-1].replace('.html', '')
-
-        # Transaction logs don't specify Exhitbit 10 contracts on waives, so filter these and continue here.
-        if player_id not in player_dict.keys():
-            return
-
-        to_team = 'FA'
-        player_movement = {
-            "player_id": player_id,
-            "from_team": player_dict[player_id]['team_id'],
-            "to_team": to_team,
-        }
-        player_data = [player_movement]
-
-    elif transaction_type == "traded":
-        links = transaction.find_all("a")
-        player_data = process_trade(links)
-
-    elif transaction_type == "-team trade":
-        transaction_type = "traded"
-        player_data = process_multi_team(transaction)
-
-    affected_teams = []
-    for player in player_data:
-        affected_teams += [player['from_team'], player['to_team']]
-
-    transaction_id = format_transaction_id(transaction_type, formatted_date, player_data)
-
-    transaction_dict = {
-        "id": transaction_id,
-        "type": transaction_type,
-        "date": formatted_date,
-        "players": player_data,
-        "affected_teams": list(set(affected_teams)),
-        "text": transaction_text
-    }
-
-    if transaction_id in processed_transaction_ids:
-        return None
-    else:
-        for player in player_data:
-            player_dict[player["player_id"]]["team_id"] = player["to_team"]
-        
-        return transaction_dict
-
-
-def find_player(player_name_string):
-    # Occasionally there's more than one name option, separated by a slash and (even more rarely) there's sometimes a trailing parenthetical after name
-    name_options = [x.split(' (')[0] for x in player_name_string.split(' / ')]
-    
-    for player in player_dict.values():
-        if player['player'] in name_options:
-            return player
-
-
-def find_team(team_name):
-    if team_name.strip() == 'Blazers':
-        team_name = 'Trailblazers'
-
-    for team in team_data:
-        if str(team_name).strip() == str(team['team_nickname']).strip():
-            return team
-
+state = BuildContext(load_players(), load_team_data())
+prosports_transactions = load_prosports_transactions()
 
-def process_prosports_transaction(transaction):
-    transaction_text = transaction['notes']
+for season in args.seasons:
+    if args.fresh:
+        reset_checkpoint(season)
 
-    for phrase in transaction_types:
-        if phrase in transaction_text:
-            transaction_type = phrase
-            break
-    
-    involved_player = (transaction['relinquished'] + transaction['acquired'])[0]
-    player = find_player(involved_player)
-    
-    # Seems to always be g-league/exhibit 10 player
-    if not player:
-        return None
+    # With no checkpoint, a season starts from whatever state the previous season ended in (or players_start.csv for the first one)
+    checkpoint, season_transactions = load_checkpoint(season, stream=not collect)
+    if checkpoint:
+        state.restore_rosters(checkpoint['rosters'])
+        state.dedup = DedupIndex.from_json(checkpoint['dedup'])
+        last_date = checkpoint['last_date']
     else:
-        player_id = player['player_id']
-
-    team = find_team(transaction['team'])
-    team_id = team['team_id']
-    
-    affected_teams = [team_id, "FA"]
-    transaction_text = transaction['notes'] + '.'
-    salary_data = None
-    
-    if transaction_type == "exercised":
-        transaction_type = "exercised option"
-        from_team = team_id
-        to_team = team_id
-        affected_teams = [team_id]
-        
-        if transaction_text.startswith("player"):
-            transaction_text = transaction_text.replace("player", f"{player['player']} ({team['team_nickname']})")
-        else:
-            transaction_text = transaction_text.replace("team exercised", f"{team['team_nickname']} exercised {player['player']}'s")
-
-
-    elif transaction_type == "declined contract option":
-        transaction_type = "declined option"
-        from_team = team_id
-        to_team = "FA"
-
-        if transaction_text.startswith("player"):
-            transaction_text = transaction_text.replace("player", f"{player['player']} ({team['team_nickname']})")
-        else:
-            transaction_text = transaction_text.replace("team declined", f"{team['team_nickname']} declined {player['player']}'s")
-
-    elif transaction_type == "waived":
-        # If player isn't on this team in roster start, they're on a two-way or Exhibit 10 contract and this waiver shouldn't be processed
-        if player['team_id'] != team_id:
-            return None
-
-        from_team = team_id
-        to_team = "FA"
-
-        transaction_text = f"The {team['team_full_name']} waived {player['player']}."
-    
-    elif transaction_type == "claimed":
-        from_team = player_dict[player_id]['team_id']
-        to_team = team_id
-
-        affected_teams = [from_team, to_team]
-        transaction_text = f"The {team['team_full_name']} claimed {player['player']} off waivers."
-
-    elif transaction_type == "signed":
-        from_team = player_dict[player_id]['team_id']
-        to_team = team_id
-        affected_teams = [from_team, to_team]
-
-        contract_clause = transaction_text.split(' to a ')[-1]
-
-        if '-year' not in transaction_text:
-            verb = contract_clause.split()[0]
-            transaction_text = f"The {team['team_full_name']} {verb} {player['player']}."
-        else:
-            transaction_text = f"The {team['team_full_name']} signed {player['player']} to a {contract_clause}"
-
-            # EX clause: "1-year $2.3M contract." OR "1-year contract." OR "3-year $24.7M contract." (can't tell current annual salary on multi-years like this)
-            if contract_clause[0] == '1' and  '$' in contract_clause[7:]:
-                salary_figure = [x for x in contract_clause.split() if '$' in x][0]
-                new_salary = int(1000000*float(salary_figure.replace("$", "").replace("M", "").split("-")[0]))
-                salary_data = {
-                    'start_salary': player_dict[player_id]['current_salary'],
-                    'end_salary': new_salary
-                }
-                player_dict[player_id]['current_salary'] = new_salary
-
+        last_date = ''
 
-    elif transaction_type == "contract extension":
-        from_team = team_id
-        to_team = team_id
+    if collect:
+        all_transactions += season_transactions
+    if stream:
+        stream.write(season_transactions)
 
-        transaction_text = f"The {team['team_full_name']} signed {player['player']} to a {transaction_text.split(' to a ')[-1]}."
+    resume_point = checkpoint
 
+    def on_date(formatted_date, date_transactions, context):
+        global resume_point
+        print(formatted_date)
+        resume_point = save_checkpoint(season, formatted_date, date_transactions, context, previous=resume_point)
+        if stream:
+            stream.write(date_transactions)
 
-    player_movement = {
-        "player_id": player_id,
-        "from_team": from_team,
-        "to_team": to_team,
-    }
+    r = fetch.get(f"https://www.basketball-reference.com/leagues/NBA_{season}_transactions.html")
+    new_transactions, state = build_transactions(r.text, prosports_transactions, state, after_date=last_date, on_date=on_date, collect=collect)
+    all_transactions += new_transactions
 
-    player_data = [player_movement]
+if stream:
+    with metrics.timer('serialize', artifact='transaction_partitions'):
+        stream.close()
 
-    transaction_dict = {
-        "id": format_transaction_id(transaction_type, transaction['date'], player_data),
-        "type": transaction_type,
-        "date": transaction['date'],
-        "players": player_data,
-        "affected_teams": affected_teams,
-        "text": transaction_text
-    }
+# Which source won each duplicate merge, for checking the fuzzy matching
+artifacts.write_if_changed('../data/dedup_report.json', json.dumps(state.dedup.merges, indent=1))
 
-    if salary_data:
-        transaction_dict['salary_data'] = salary_data
-
-    for player in player_data:
-        player_dict[player["player_id"]]["team_id"] = player["to_team"]
-    
-    return transaction_dict
-
-
-transaction_types = ['exercised', 'declined contract option', 'contract extension', 'signed', 'waived', 'claimed', '-team trade', 'traded']
-all_transactions = []
-processed_transaction_ids = []
-signed_then_waived = []
-
-with open('../data/players_start.csv', 'r', encoding='utf-8-sig') as f:
-    player_dict = {x['player_id']: x for x in csv.DictReader(f)}
-    for player_id, player in player_dict.items():
-        player_dict[player_id]['current_salary'] = (0 if player['2021_preseason_salary'] == '' else player['2021_preseason_salary'])
-
-with open('../data/team_data.csv', 'r', encoding='utf-8-sig') as f:
-    team_data = [x for x in csv.DictReader(f)]
-
-with open('../data/supplementary_transaction_data.json', 'r') as f:
-    prosports_transactions = [x for x in json.load(f) if 'waived' in x['notes'] or 'contract option' in x['notes'] or 'signed' in x['notes'] or 'claimed' in x['notes']]
-    prosports_transactions = [x for x in prosports_transactions if '10-day contract' not in x['notes'] and 'Exhibit 10' not in x['notes'] and 'two way contract' not in x['notes'] and 'option for 2021-22' not in x['notes'] and 're-signed' not in x['notes']]
-
-r = requests.get("https://www.basketball-reference.com/leagues/NBA_2021_transactions.html")
-soup = BeautifulSoup(r.text, 'html.parser')
-
-content = soup.find("div", attrs={"id": "content"}).find("ul", attrs={"class": "page_index"})
-transaction_dates = content.find_all("li")
-
-
-for date in transaction_dates[::-1]:
-    date_string = date.find("span").text
-
-    if date_string == "?":
-        continue
+# all_transactions.sort(key=lambda x: (datetime.strptime(x['date'], "%Y-%m-%d"))
 
-    formatted_date = datetime.strftime(datetime.strptime(date_string, "%B %d, %Y"), "%Y-%m-%d")
-    print(date_string)
+if collect:
+    with metrics.timer('serialize', artifact='transactions'):
+        records.dump_transactions(all_transactions, ['../data/transactions.json', '../../public/data/transactions.json'])
 
-    prosports_date_transactions = [x for x in prosports_transactions if x['date'] == formatted_date]
-    prosports_waivers = [x for x in prosports_date_transactions if 'waived' in x['notes'] or 'claimed' in x['notes']]
-    prosports_nonwaivers = [x for x in prosports_date_transactions if 'waived' not in x['notes'] and 'claimed' not in x['notes']]
-    
-    for transaction in prosports_nonwaivers:
-        transaction_dict = process_prosports_transaction(transaction)
-        if transaction_dict:
-            processed_transaction_ids.append(transaction_dict['id'])
-            all_transactions.append(transaction_dict)
-    
-    bbref_transactions = date.find_all("p")
-    for transaction in bbref_transactions:
-        transaction_text = transaction.text
+    # Compact columnar copy of players_start.csv + transactions.json for the frontend (see columnar.py)
+    with metrics.timer('serialize', artifact='columnar'):
+        columnar.write_columnar('../data/players_start.csv', all_transactions, ['../data/columnar.json', '../../public/data/columnar.json'])
 
-        if " hired " in transaction_text or "Exhibit 10" in transaction_text or "two-way contract" in transaction_text:
-            continue
-        else:
-            transaction_dict = process_bbref_transaction(transaction, transaction_text)
-            if transaction_dict:
-                all_transactions.append(transaction_dict)
-    
-    for transaction in prosports_waivers:
-        transaction_dict = process_prosports_transaction(transaction)
-        if transaction_dict:
-            processed_transaction_ids.append(transaction_dict['id'])
-            all_transactions.append(transaction_dict)
-        
-# all_transactions.sort(key=lambda x: (datetime.strptime(x['date'], "%Y-%m-%d"))
+    # Keyframe + per-date diff roster snapshots, so any date's rosters can be looked up without a full replay (see snapshots.py)
+    with metrics.timer('serialize', artifact='roster_snapshots'):
+        snapshots.write_snapshots('../data/players_start.csv', all_transactions, ['../data/roster_snapshots.json'])
 
-with open('../data/transactions.json', 'w') as f:
-    json.dump(all_transactions, f)
+    # Per-team payroll, roster size and summed stats on every transaction date (see aggregates.py)
+    with metrics.timer('serialize', artifact='team_aggregates'):
+        aggregates.write_aggregates('../data/players_start.csv', all_transactions, ['../data/team_aggregates.json', '../../public/data/team_aggregates.json'])
 
-with open('../../public/data/transactions.json', 'w') as f:
-    json.dump(all_transactions, f)
\ No newline at end of file
+    # Cumulative team-to-team flow counts/salary per date with arc endpoints, for date-range lookups (see flows.py)
+    with metrics.timer('serialize', artifact='team_flows'):
+        flows.write_flows('../data/players_start.csv', '../data/team_data.csv', all_transactions, ['../data/team_flows.json'])
@@ -0,0 +1,139 @@
+import argparse
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+# Counters and timers for the data scripts. fetch/parsing/transaction_builder record into this module as they run, and
+# each script calls start(stage) once. Nothing is written unless a script is run with:
+#
+#   --metrics PATH   write the run's metrics on exit, as Prometheus text if PATH ends in .prom/.txt, else JSON
+#   --profile PATH   cProfile the run (main thread only) and dump pstats to PATH
+#
+# "{stage}" in either path is replaced with the stage name, so one set of flags can be passed to every script
+# (e.g. through pipeline.py): --metrics ../data/metrics/{stage}.prom
+
+PREFIX = 'nba_pipeline'
+
+parser = argparse.ArgumentParser(add_help=False)
+parser.add_argument('--metrics')
+parser.add_argument('--profile')
+options, _ = parser.parse_known_args()
+
+lock = threading.Lock()
+counters = defaultdict(float)
+# (name, labels) -> [count, total seconds]
+timers = defaultdict(lambda: [0, 0.0])
+stage = None
+profiler = None
+started = None
+
+
+def label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def increment(name, value=1, **labels):
+    with lock:
+        counters[(name, label_key(labels))] += value
+
+
+def record_time(name, seconds, **labels):
+    with lock:
+        entry = timers[(name, label_key(labels))]
+        entry[0] += 1
+        entry[1] += seconds
+
+
+@contextmanager
+def timer(name, **labels):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_time(name, time.perf_counter() - start_time, **labels)
+
+
+def to_json():
+    with lock:
+        return {
+            "stage": stage,
+            "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(counters.items())],
+            "timers": [{"name": name, "labels": dict(labels), "count": count, "seconds": round(seconds, 6)} for (name, labels), (count, seconds) in sorted(timers.items())]
+        }
+
+
+def format_labels(labels):
+    labels = ([("stage", stage)] if stage else []) + list(labels)
+    if not labels:
+        return ''
+
+    escape = lambda value: value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels) + '}'
+
+
+def format_value(value):
+    # Exact, unlike :g (which rounds to 6 significant digits, e.g. 12345678 bytes -> 1.23457e+07)
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def to_prometheus():
+    lines = []
+    with lock:
+        for name in sorted(set(name for name, _ in counters)):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines += [f"{PREFIX}_{name}_total{format_labels(labels)} {format_value(value)}" for (key, labels), value in sorted(counters.items()) if key == name]
+
+        for name in sorted(set(name for name, _ in timers)):
+            lines.append(f"# TYPE {PREFIX}_{name}_seconds summary")
+            for (key, labels), (count, seconds) in sorted(timers.items()):
+                if key == name:
+                    lines.append(f"{PREFIX}_{name}_seconds_sum{format_labels(labels)} {seconds:.6f}")
+                    lines.append(f"{PREFIX}_{name}_seconds_count{format_labels(labels)} {count}")
+
+    return '\n'.join(lines) + '\n'
+
+
+def make_parent_dir(filename):
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+
+def write(filename):
+    make_parent_dir(filename)
+    with open(filename, 'w') as f:
+        if filename.endswith(('.prom', '.txt')):
+            f.write(to_prometheus())
+        else:
+            json.dump(to_json(), f, indent=1)
+
+
+def finish():
+    record_time('run', time.perf_counter() - started)
+
+    if profiler:
+        profiler.disable()
+        make_parent_dir(options.profile.format(stage=stage))
+        profiler.dump_stats(options.profile.format(stage=stage))
+
+    if options.metrics:
+        write(options.metrics.format(stage=stage))
+
+
+def start(stage_name):
+    # Call once at the top of a script. Starts the profiler if asked for and writes everything out when the script exits.
+    global stage, profiler, started
+    stage = stage_name
+    started = time.perf_counter()
+
+    if options.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if options.metrics or options.profile:
+        atexit.register(finish)
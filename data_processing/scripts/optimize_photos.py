@@ -0,0 +1,209 @@
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from artifacts import file_hash, write_if_changed
+
+
+# Packs the player photos into a few sprite atlases, so the map loads a handful of images instead of one per player:
+#
+#   player_sprites/index.json              {"version", "size", "columns", "atlases": [{"webp", "width", "height"}],
+#                                           "photos": {player_id: [atlas, x, y]}}
+#   player_sprites/atlas-0.<hash>.webp     up to PER_ATLAS photos, SIZE x SIZE each, in a COLUMNS-wide grid
+#
+# Every photo is cropped square (keeping the top, where the face is) and resized to SIZE, the largest the map draws a
+# player. Resized tiles are kept in TILE_DIR, and STATE_FILE records each one's source hash, so only photos whose
+# source file changed are reprocessed. A player keeps the same slot from run to run, and an atlas is only re-encoded
+# when one of its tiles changed. Atlas files are named by content hash, so they can be cached for good.
+#
+# Photos come from SOURCE_DIRS in order, and a later directory wins for the same player, the same as copying
+# get_new_images.py's downloads over the published ones. Needs Pillow.
+#
+# Atlases are WebP only: the map draws them through SVG <image>, which has no <picture>/image-set style fallback, so
+# a second format couldn't be served to the browsers that support it.
+
+SOURCE_DIRS = ['../../public/images/player_photos', '../data/new_images']
+OUT_DIR = '../../public/images/player_sprites'
+TILE_DIR = '../data/photo_tiles'
+STATE_FILE = '../data/photo_state.json'
+
+FORMAT_VERSION = 1
+SIZE = 120
+COLUMNS = 16
+PER_ATLAS = 256
+WEBP_QUALITY = 80
+
+
+def find_sources(source_dirs=SOURCE_DIRS):
+    # {player_id: path}
+    sources = {}
+    for source_dir in source_dirs:
+        for filename in sorted(glob.glob(os.path.join(source_dir, '*.png')) + glob.glob(os.path.join(source_dir, '*.jpg'))):
+            sources[os.path.splitext(os.path.basename(filename))[0]] = filename
+    return sources
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {"size": SIZE, "tiles": {}, "slots": {}, "atlases": []}
+
+    with open(STATE_FILE, 'r') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    with open(STATE_FILE + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(STATE_FILE + '.tmp', STATE_FILE)
+
+
+def tile_path(player_id):
+    return os.path.join(TILE_DIR, f"{player_id}.png")
+
+
+def make_tile(source, out_file, size=SIZE):
+    # Runs in a worker process. Returns the tile's hash.
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        tile = ImageOps.fit(image.convert('RGBA'), (size, size), Image.LANCZOS, centering=(0.5, 0.0))
+
+    buffer = io.BytesIO()
+    tile.save(buffer, 'PNG', optimize=True)
+    write_if_changed(out_file, buffer.getvalue())
+    return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+def update_tiles(sources, state, max_workers=None):
+    # Remakes tiles whose source changed (or that are missing). Returns the player ids that were remade.
+    os.makedirs(TILE_DIR, exist_ok=True)
+    if state.get("size") != SIZE:
+        state["size"], state["tiles"] = SIZE, {}
+
+    source_hashes = {player_id: file_hash(source) for player_id, source in sources.items()}
+    stale = [x for x in sources if state["tiles"].get(x, {}).get("source") != source_hashes[x] or not os.path.exists(tile_path(x))]
+
+    with metrics.timer('tile_pool'), ProcessPoolExecutor(max_workers=max_workers) as executor:
+        tile_hashes = executor.map(make_tile, [sources[x] for x in stale], [tile_path(x) for x in stale])
+        for player_id, tile_hash in zip(stale, tile_hashes):
+            state["tiles"][player_id] = {"source": source_hashes[player_id], "tile": tile_hash}
+
+    for player_id in set(state["tiles"]) - set(sources):
+        del state["tiles"][player_id]
+        if os.path.exists(tile_path(player_id)):
+            os.remove(tile_path(player_id))
+
+    metrics.increment('photo_tiles', len(stale), outcome='remade')
+    metrics.increment('photo_tiles', len(sources) - len(stale), outcome='unchanged')
+    return stale
+
+
+def assign_slots(player_ids, slots):
+    # Players keep their slot; removed players free theirs up for new ones, filled lowest first
+    slots = {x: slot for x, slot in slots.items() if x in player_ids}
+    taken = set(slots.values())
+    free = (x for x in range(len(player_ids)) if x not in taken)
+    for player_id in sorted(player_ids):
+        if player_id not in slots:
+            slots[player_id] = next(free)
+    return slots
+
+
+def slot_position(slot):
+    # (atlas, x, y)
+    cell = slot % PER_ATLAS
+    return slot // PER_ATLAS, (cell % COLUMNS) * SIZE, (cell // COLUMNS) * SIZE
+
+
+def encode_atlas(members):
+    # members: [(player_id, x, y)]. Returns the WebP bytes and the atlas size.
+    from PIL import Image
+
+    width = COLUMNS * SIZE
+    height = (max(y for _, _, y in members) // SIZE + 1) * SIZE
+    atlas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    for player_id, x, y in members:
+        with Image.open(tile_path(player_id)) as tile:
+            atlas.paste(tile, (x, y))
+
+    buffer = io.BytesIO()
+    atlas.save(buffer, 'WEBP', quality=WEBP_QUALITY)
+    return buffer.getvalue(), width, height
+
+
+def build_atlases(state, max_workers=None):
+    by_atlas = {}
+    for player_id, slot in state["slots"].items():
+        atlas, x, y = slot_position(slot)
+        by_atlas.setdefault(atlas, []).append((player_id, x, y))
+
+    previous = state.get("atlases", [])
+    atlases = []
+    to_encode = []
+    for i in range(max(by_atlas, default=-1) + 1):
+        members = sorted(by_atlas.get(i, []), key=lambda x: (x[2], x[1]))
+        # Re-encoded only if a tile in it moved or changed
+        key = hashlib.sha256(json.dumps([[x, y, state["tiles"][player_id]["tile"]] for player_id, x, y in members] + [SIZE, WEBP_QUALITY]).encode('utf-8')).hexdigest()
+        if i < len(previous) and previous[i]["key"] == key and previous[i]["webp"] and os.path.exists(os.path.join(OUT_DIR, previous[i]["webp"])):
+            atlases.append(previous[i])
+            continue
+
+        atlases.append({"key": key, "webp": None, "width": 0, "height": 0})
+        if members:
+            to_encode.append((i, members))
+
+    # Encoding dominates a full rebuild, so changed atlases are encoded side by side
+    with metrics.timer('encode_atlases'), ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(encode_atlas, [members for _, members in to_encode])
+        for (i, _), (data, width, height) in zip(to_encode, results):
+            filename = f"atlas-{i}.{hashlib.sha256(data).hexdigest()[:12]}.webp"
+            write_if_changed(os.path.join(OUT_DIR, filename), data)
+            atlases[i].update({"webp": filename, "width": width, "height": height})
+
+    metrics.increment('photo_atlases', len(to_encode), outcome='encoded')
+    return atlases
+
+
+def write_index(state):
+    index = {
+        "version": FORMAT_VERSION,
+        "size": SIZE,
+        "columns": COLUMNS,
+        "atlases": [{x: atlas[x] for x in ["webp", "width", "height"]} for atlas in state["atlases"]],
+        "photos": {player_id: list(slot_position(slot)) for player_id, slot in sorted(state["slots"].items())}
+    }
+    write_if_changed(os.path.join(OUT_DIR, 'index.json'), json.dumps(index, separators=(',', ':')))
+
+    # Drop atlas files the index no longer points at
+    current = set(atlas["webp"] for atlas in state["atlases"] if atlas["webp"])
+    for filename in os.listdir(OUT_DIR):
+        if filename.startswith('atlas-') and filename not in current:
+            os.remove(os.path.join(OUT_DIR, filename))
+
+
+def optimize_photos(source_dirs=SOURCE_DIRS, max_workers=None):
+    sources = find_sources(source_dirs)
+    state = load_state()
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    remade = update_tiles(sources, state, max_workers)
+    state["slots"] = assign_slots(set(sources), state.get("slots", {}))
+    state["atlases"] = build_atlases(state, max_workers)
+    write_index(state)
+    save_state(state)
+
+    print(f"{len(sources)} photos, {len(remade)} resized, {len(state['atlases'])} atlases")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=None, help="Processes used to resize photos and encode atlases (default: one per CPU)")
+    args, _ = parser.parse_known_args()
+
+    metrics.start('photos')
+    optimize_photos(max_workers=args.workers)
@@ -0,0 +1,88 @@
+import re
+
+from bs4 import BeautifulSoup
+
+import metrics
+
+
+class MissingElement(ValueError):
+    pass
+
+
+def attrs_match(tag_text, attrs):
+    for name, value in attrs.items():
+        match = re.search(rf'\s{name}\s*=\s*["\']([^"\']*)["\']', tag_text)
+        if not match:
+            return False
+
+        # class can hold several space-separated names, so match it the way BeautifulSoup does
+        if name == 'class':
+            if value not in match.group(1).split():
+                return False
+        elif match.group(1) != value:
+            return False
+
+    return True
+
+
+def in_comment(html, position):
+    return html.rfind('<!--', 0, position) > html.rfind('-->', 0, position)
+
+
+def extract_element(html, tag, attrs=None, index=0):
+    # Return the raw source of the index-th <tag> with these attrs (skipping commented-out markup, like BeautifulSoup's find), or None.
+    # html can itself be None (an enclosing element that wasn't found), which also gives None.
+    if html is None:
+        return None
+
+    attrs = attrs or {}
+    tag_pattern = re.compile(rf'<(/?){tag}\b[^>]*>', re.IGNORECASE)
+
+    start = None
+    for match in tag_pattern.finditer(html):
+        if match.group(1) or not attrs_match(match.group(0), attrs) or in_comment(html, match.start()):
+            continue
+        if index == 0:
+            start = match
+            break
+        index -= 1
+
+    if not start:
+        return None
+
+    # Walk forward to the matching close tag, counting nested tags of the same name
+    depth = 0
+    for match in tag_pattern.finditer(html, start.start()):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return html[start.start():match.end()]
+
+    return html[start.start():]
+
+
+def parse_element(html, tag, attrs=None, index=0):
+    # Build a DOM for just the target table/list instead of the whole page. Falls back to a full parse if the element can't be located.
+    # Returns None if it isn't there at all, or if html is None.
+    if html is None:
+        return None
+
+    with metrics.timer('parse', tag=tag):
+        fragment = extract_element(html, tag, attrs, index)
+        if fragment is None:
+            metrics.increment('parse_fallbacks', tag=tag)
+            soup = BeautifulSoup(html, 'html.parser')
+            matches = soup.find_all(tag, attrs=attrs or {})
+            return matches[index] if len(matches) > index else None
+
+        return BeautifulSoup(fragment, 'html.parser').find(tag)
+
+
+def require_element(html, tag, attrs=None, index=0):
+    # parse_element for elements a scraper can't do without, so a page whose layout has changed fails here, naming what's
+    # missing, rather than with an AttributeError on None further on
+    element = parse_element(html, tag, attrs, index)
+    if element is None:
+        described = ''.join(f' {name}="{value}"' for name, value in (attrs or {}).items())
+        raise MissingElement(f"No <{tag}{described}> found (index {index}); has the page layout changed?")
+
+    return element
@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import unidecode
+import urllib3
+
+import fetch
+
+
+MANIFEST_FILE = '../data/photo_manifest.json'
+# 2kratings adds photos over the season, so a player without one is looked for again after this long
+RETRY_TTL = 60 * 60 * 24 * 7
+
+
+def photo_url(player_name):
+    formatted_player_name = unidecode.unidecode(player_name.replace(' ', '-').replace('\'','').replace('.',''))
+    return f"https://www.2kratings.com/wp-content/uploads/{formatted_player_name}-2K-Rating.png"
+
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {}
+
+    with open(MANIFEST_FILE, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_FILE + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(MANIFEST_FILE + '.tmp', MANIFEST_FILE)
+
+
+def probe(url, session, limiter, etag=None):
+    # etag: the one from the last successful probe of this url, sent as If-None-Match so an unchanged photo is a 304.
+    # A failed request (connection error, retries used up on 429s) is recorded as that player's status instead of
+    # aborting the whole batch. It has no status code, so it isn't downloaded and is probed again on the next run.
+    headers = {'If-None-Match': etag} if etag else {}
+    probed_at = time.time()
+    try:
+        limiter.wait(url)
+        r = session.head(url, allow_redirects=True, headers=headers)
+
+        # Some hosts don't answer HEAD properly, so fall back to a streamed GET and only read the headers
+        if r.status_code in (403, 405):
+            limiter.wait(url)
+            r = session.get(url, stream=True, headers=headers)
+            r.close()
+    except requests.RequestException as e:
+        return {"url": url, "status": None, "etag": None, "error": f"{type(e).__name__}: {e}", "probed_at": probed_at}
+
+    if r.status_code == 304:
+        return {"url": url, "status": 200, "etag": etag, "error": None, "probed_at": probed_at}
+
+    return {"url": url, "status": r.status_code, "etag": r.headers.get('ETag'), "error": None, "probed_at": probed_at}
+
+
+def needs_probe(entry, url, now):
+    # New players, changed urls and failed probes are always probed. Found photos are revalidated every run (a 304 when
+    # unchanged), and players whose photo wasn't there are retried once their last probe is RETRY_TTL old.
+    if not entry or entry.get('url') != url or entry.get('status') in (None, 200):
+        return True
+    return now - entry.get('probed_at', 0) >= RETRY_TTL
+
+
+def known_etag(entry, url):
+    return entry['etag'] if entry and entry.get('url') == url and entry.get('status') == 200 else None
+
+
+def resolve_photos(players, max_workers=8):
+    # players: records.Player. Returns {player_id: {url, status, etag, error, probed_at}}, probing the players needs_probe picks
+    manifest = load_manifest()
+    now = time.time()
+    to_probe = [(x.player_id, photo_url(x.player)) for x in players]
+    to_probe = [(player_id, url) for player_id, url in to_probe if needs_probe(manifest.get(player_id), url, now)]
+
+    if to_probe and not fetch.OFFLINE:
+        session = fetch.get_session()
+        limiter = fetch.HostRateLimiter(delay=0.1)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(lambda x: probe(x[1], session, limiter, known_etag(manifest.get(x[0]), x[1])), to_probe)
+                for (player_id, _), result in zip(to_probe, results):
+                    manifest[player_id] = result | {"downloaded_etag": manifest.get(player_id, {}).get('downloaded_etag')}
+        finally:
+            # Keep whatever finished, even if something unexpected stops the batch
+            save_manifest(manifest)
+
+    return manifest
+
+
+def download(player_id, entry, out_dir, session):
+    # Returns (etag, error); a failed download leaves any existing photo in place and is retried next run
+    out_file = os.path.join(out_dir, f"{player_id}.png")
+
+    try:
+        with session.get(entry['url'], stream=True) as r:
+            if r.status_code != 200:
+                return None, f"HTTP {r.status_code}"
+
+            with open(out_file + '.tmp', 'wb') as f:
+                r.raw.decode_content = True
+                shutil.copyfileobj(r.raw, f)
+            os.replace(out_file + '.tmp', out_file)
+
+            return r.headers.get('ETag', entry['etag']), None
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        if os.path.exists(out_file + '.tmp'):
+            os.remove(out_file + '.tmp')
+        return None, f"{type(e).__name__}: {e}"
+
+
+def download_photos(players, out_dir, max_workers=8):
+    # Stream each resolved photo straight to disk, skipping files we already have at the same ETag
+    manifest = resolve_photos(players)
+    os.makedirs(out_dir, exist_ok=True)
+
+    to_download = []
+    for player in players:
+        entry = manifest.get(player.player_id)
+        if not entry or entry['status'] != 200:
+            continue
+        if os.path.exists(os.path.join(out_dir, f"{player.player_id}.png")) and entry.get('downloaded_etag') == entry['etag']:
+            continue
+        to_download.append((player.player_id, entry))
+
+    if not to_download or fetch.OFFLINE:
+        return
+
+    session = fetch.get_session()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda x: download(x[0], x[1], out_dir, session), to_download)
+            for (player_id, entry), (etag, error) in zip(to_download, results):
+                if etag:
+                    entry['downloaded_etag'] = etag
+                entry['download_error'] = error
+    finally:
+        save_manifest(manifest)
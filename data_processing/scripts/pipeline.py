@@ -0,0 +1,223 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import fetch
+import get_players
+import metrics
+import get_table_transactions
+import publish
+from artifacts import file_hash
+from parsing import extract_element
+
+
+# Runs the data scripts in order (what run_scripts.sh used to do), skipping any stage whose inputs haven't changed:
+#
+#   python pipeline.py [--force] [--dry-run] [--only transactions photos ...] [--seasons 2021] [--offline]
+#                      [--metrics ../data/metrics/{stage}.prom] [--profile ../data/metrics/{stage}.pstats]
+#
+# A stage's fingerprint covers its code, its input files, the arguments it's run with and the pages it scrapes. Source
+# pages are revalidated against the http cache (a 304 costs one round trip) and fingerprinted on just the part of the
+# page the stage reads, so ads/timestamps elsewhere on the page don't count as a change. Fingerprints and output hashes
+# from the last successful run are kept in STATE_FILE. Writers only rewrite files whose content changed (artifacts.py),
+# so a stage that reruns without producing anything new doesn't trigger the stages after it.
+
+STATE_FILE = '../data/pipeline_state.json'
+
+
+def stat_sources(args):
+    years = range(args.start_year, args.end_year + 1)
+    sources = [(base_url.format(year), ("tbody", {}), {}) for base_url in get_players.STAT_URLS for year in years]
+    sources += [(x["link"], ("table", {}), {"allow_redirects": False}) for x in get_players.contract_link_data(years).values()]
+    return sources
+
+
+def prosports_sources(args):
+    # Fingerprints the whole-season search rather than the bounded one the stage runs, which starts from the newest
+    # stored date and would change with every run that stores new rows. Results run oldest first, so new rows show up
+    # on the last page, and a new page shows up as a different last page url. The first page only gives the page count.
+    r = fetch.get(get_table_transactions.BASE_URL, ttl=0)
+    last_page = get_table_transactions.page_urls(get_table_transactions.page_count(r.text))[-1]
+    return [(last_page, ("table", {"class": "datatable"}), {})]
+
+
+def bbref_transaction_sources(args):
+    return [(f"https://www.basketball-reference.com/leagues/NBA_{season}_transactions.html", ("ul", {"class": "page_index"}), {}) for season in args.seasons]
+
+
+STAGES = [
+    {
+        "name": "players",
+        "script": "get_players.py",
+        "code": ["get_players.py", "fetch.py", "parsing.py", "photos.py", "records.py", "artifacts.py", "metrics.py"],
+        "inputs": [],
+        "args": lambda args: ["--start-year", str(args.start_year), "--end-year", str(args.end_year)],
+        "sources": stat_sources,
+        "outputs": ["../data/players.csv"]
+    },
+    {
+        "name": "initial_rosters",
+        "script": "get_initial_rosters.py",
+        "code": ["get_initial_rosters.py", "fetch.py", "parsing.py", "positions.py", "records.py", "artifacts.py", "metrics.py"],
+        # Contract pages come from a fixed wayback snapshot and are cached for good, so there's nothing to revalidate
+        "inputs": ["../data/players.csv", "../data/team_data.csv"],
+        "args": lambda args: [],
+        "sources": lambda args: [],
+        "outputs": ["../data/players_start.csv", "../../public/data/players_start.csv"]
+    },
+    {
+        "name": "table_transactions",
+        "script": "get_table_transactions.py",
+        "code": ["get_table_transactions.py", "fetch.py", "parsing.py", "artifacts.py", "metrics.py"],
+        "inputs": [],
+        "args": lambda args: [],
+        "sources": prosports_sources,
+        "outputs": ["../data/supplementary_transaction_data.json"]
+    },
+    {
+        "name": "transactions",
+        "script": "get_transactions.py",
+        "code": ["get_transactions.py", "transaction_builder/*.py", "transaction_stream.py", "records.py", "columnar.py", "snapshots.py", "aggregates.py", "flows.py", "fetch.py", "parsing.py", "artifacts.py", "metrics.py"],
+        "inputs": ["../data/players_start.csv", "../data/team_data.csv", "../data/supplementary_transaction_data.json"],
+        "args": lambda args: ["--seasons"] + [str(x) for x in args.seasons],
+        # Checkpoints only hold while the starting rosters and code stay the same, so anything but a page change replays from scratch
+        "fresh_args": ["--fresh"],
+        "sources": bbref_transaction_sources,
+        "outputs": [
+            "../data/transactions.json", "../../public/data/transactions.json",
+            "../data/columnar.json", "../../public/data/columnar.json",
+            "../data/roster_snapshots.json",
+            "../data/team_aggregates.json", "../../public/data/team_aggregates.json",
+            "../data/team_flows.json",
+            "../data/dedup_report.json"
+        ]
+    },
+    {
+        "name": "publish",
+        "script": "publish.py",
+        "code": ["publish.py", "artifacts.py", "metrics.py"],
+        "inputs": [os.path.join(publish.DATA_DIR, x) for x in publish.ARTIFACTS],
+        "args": lambda args: [],
+        "sources": lambda args: [],
+        "outputs": ["../../public/data/manifest.json"]
+    },
+    {
+        "name": "photos",
+        "script": "optimize_photos.py",
+        "code": ["optimize_photos.py", "artifacts.py", "metrics.py"],
+        # Source photos, including get_new_images.py's downloads
+        "inputs": ["../../public/images/player_photos/*", "../data/new_images/*"],
+        "args": lambda args: [],
+        "sources": lambda args: [],
+        "outputs": ["../../public/images/player_sprites/index.json"]
+    }
+]
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+
+    with open(STATE_FILE, 'r') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    with open(STATE_FILE + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(STATE_FILE + '.tmp', STATE_FILE)
+
+
+def digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def source_fingerprint(url, element, kwargs):
+    # Revalidates the cached page (ttl=0) with the same request options the stage uses, so the stage itself then reads
+    # it from a fresh cache entry
+    r = fetch.get(url, ttl=0, **kwargs)
+    content = r.text
+    if element:
+        content = extract_element(content, element[0], element[1]) or content
+
+    return [r.status_code, hashlib.sha256(content.encode('utf-8')).hexdigest()]
+
+
+def input_fingerprint(stage, args):
+    code_files = sorted(filename for pattern in stage["code"] for filename in glob.glob(pattern))
+    # Inputs can be patterns too; a plain path that doesn't exist yet is still listed (as None)
+    input_files = sorted(filename for pattern in stage["inputs"] for filename in glob.glob(pattern) or ([] if glob.has_magic(pattern) else [pattern]))
+    return digest({
+        "code": {x: file_hash(x) for x in code_files},
+        "inputs": {x: file_hash(x) for x in input_files},
+        "args": stage["args"](args)
+    })
+
+
+def plan_stage(stage, args, state):
+    # Returns (fingerprints, reason to run or None)
+    fingerprints = {
+        "inputs": input_fingerprint(stage, args),
+        "sources": digest({url: source_fingerprint(url, element, kwargs) for url, element, kwargs in stage["sources"](args)})
+    }
+
+    previous = state.get(stage["name"])
+    if args.force:
+        return fingerprints, "forced"
+    if not previous:
+        return fingerprints, "no previous run"
+    if previous["fingerprints"]["inputs"] != fingerprints["inputs"]:
+        return fingerprints, "code, inputs or arguments changed"
+    if previous["fingerprints"]["sources"] != fingerprints["sources"]:
+        return fingerprints, "source pages changed"
+    if any(file_hash(x) != previous["outputs"].get(x) for x in stage["outputs"]):
+        return fingerprints, "outputs missing or modified"
+
+    return fingerprints, None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--force', action='store_true', help="Run every selected stage regardless of fingerprints")
+    parser.add_argument('--dry-run', action='store_true', help="Only report which stages would run")
+    parser.add_argument('--only', nargs='+', choices=[x["name"] for x in STAGES], help="Limit to these stages")
+    parser.add_argument('--start-year', type=int, default=2020)
+    parser.add_argument('--end-year', type=int, default=2021)
+    parser.add_argument('--seasons', nargs='+', type=int, default=[2021])
+    # Anything else (e.g. --offline) is passed through to every script
+    args, passthrough = parser.parse_known_args()
+
+    metrics.start('pipeline')
+    state = load_state()
+    for stage in STAGES:
+        if args.only and stage["name"] not in args.only:
+            continue
+
+        with metrics.timer('plan', pipeline_stage=stage["name"]):
+            fingerprints, reason = plan_stage(stage, args, state)
+        if not reason:
+            metrics.increment('stages', pipeline_stage=stage["name"], outcome='skipped')
+            print(f"{stage['name']}: unchanged, skipping")
+            continue
+
+        print(f"{stage['name']}: running ({reason})")
+        if args.dry_run:
+            continue
+
+        # Run with fresh_args when something besides the source pages changed since the stage's last run
+        previous = state.get(stage["name"])
+        fresh = stage.get("fresh_args", []) if not previous or previous["fingerprints"]["inputs"] != fingerprints["inputs"] or args.force else []
+        with metrics.timer('stage', pipeline_stage=stage["name"]):
+            subprocess.run([sys.executable, stage["script"]] + stage["args"](args) + fresh + passthrough, check=True)
+        metrics.increment('stages', pipeline_stage=stage["name"], outcome='ran')
+
+        state[stage["name"]] = {"fingerprints": fingerprints, "outputs": {x: file_hash(x) for x in stage["outputs"]}}
+        save_state(state)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import fetch
+from parsing import parse_element
+
+
+# Fallback position lookups (a player's most recent per_game pos on their own bbref page), for players with no
+# position in either season's stats. Answers are kept in CACHE_FILE by player_id so each player is only looked up once.
+# Lookups that fail on the request itself aren't cached and are retried next run; a page with no pos is cached.
+
+CACHE_FILE = '../data/position_cache.json'
+
+
+def player_url(player_id):
+    return f"https://www.basketball-reference.com/players/{player_id[0]}/{player_id}.html"
+
+
+def load_cache():
+    if not os.path.exists(CACHE_FILE):
+        return {}
+
+    with open(CACHE_FILE, 'r') as f:
+        return json.load(f)
+
+
+def save_cache(cache):
+    with open(CACHE_FILE + '.tmp', 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(CACHE_FILE + '.tmp', CACHE_FILE)
+
+
+def parse_position(html):
+    table = parse_element(html, "table", {"id": "per_game"})
+    if table is None or table.find("tbody") is None:
+        return None, "no per_game table"
+
+    cells = table.find("tbody").find_all("td", attrs={"data-stat": "pos"})
+    if not cells or not cells[-1].text:
+        return None, "no pos in per_game table"
+
+    return cells[-1].text, None
+
+
+def lookup(player_id, session, limiter):
+    # Returns a cache entry, or None for a failure worth retrying, along with the error
+    try:
+        r = fetch.get(player_url(player_id), session=session, limiter=limiter)
+    except (requests.RequestException, fetch.CacheMiss) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+    if r.status_code >= 500:
+        return None, f"HTTP {r.status_code}"
+
+    if r.ok:
+        position, error = parse_position(r.text)
+    else:
+        position, error = None, f"HTTP {r.status_code}"
+
+    return {"position": position, "error": error}, error
+
+
+def resolve_positions(player_ids, max_workers=fetch.MAX_WORKERS):
+    # Returns ({player_id: position}, {player_id: error}) for every player_id, fetching only the ones not already cached
+    cache = load_cache()
+    to_lookup = [x for x in player_ids if x not in cache]
+
+    retry_errors = {}
+    if to_lookup:
+        session = fetch.get_session()
+        limiter = fetch.HostRateLimiter()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for player_id, (entry, error) in zip(to_lookup, executor.map(lambda x: lookup(x, session, limiter), to_lookup)):
+                if entry:
+                    cache[player_id] = entry
+                else:
+                    retry_errors[player_id] = error
+
+        save_cache(cache)
+
+    positions = {x: cache[x]['position'] for x in player_ids if x in cache and cache[x]['position']}
+    errors = {x: retry_errors.get(x) or cache[x]['error'] for x in player_ids if x not in positions}
+    return positions, errors
@@ -0,0 +1,131 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+import metrics
+from artifacts import write_if_changed
+
+
+# Publishes the ARTIFACTS in public/data under content-hashed names, with gzip and brotli copies built once here instead
+# of compressed by the server on every request:
+#
+#   public/data/published/columnar.<hash>.json(.gz/.br)   never change once written, so they can be cached for good
+#   public/data/manifest.json                             {"version", "files": {"columnar.json": {"file", "sha256",
+#                                                          "bytes", "encodings": {"gzip": {"file", "bytes"}, "br": ...}}}}
+#
+# The frontend loads manifest.json first and then fetches the hashed names it lists. Every hashed file is written
+# before the manifest, and the manifest is swapped in with a single rename. A client then sees either the old set of
+# files or the new one, never a mix or a half-written file. Files from the previous manifest are kept, so a client
+# that loaded it just before the swap can still fetch them; anything older is removed. Brotli needs the brotli package
+# and is skipped without it.
+
+DATA_DIR = '../../public/data'
+PUBLISH_DIR = 'published'
+MANIFEST_FILE = 'manifest.json'
+# Everything the frontend fetches from public/data (the transactions/ partitions already carry hashes in their index)
+ARTIFACTS = ['us_states.json', 'team_data.csv', 'columnar.json', 'transactions.json', 'players_start.csv', 'team_aggregates.json']
+
+FORMAT_VERSION = 1
+HASH_LENGTH = 12
+
+
+def compress_gzip(data):
+    # mtime=0 so the same input always gives the same bytes
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+
+    return brotli.compress(data, quality=11)
+
+
+ENCODINGS = [('gzip', '.gz', compress_gzip), ('br', '.br', compress_brotli)]
+
+
+def find_artifacts(data_dir=DATA_DIR):
+    # Artifacts a run didn't produce (e.g. with --output ndjson) are left out
+    return [os.path.join(data_dir, x) for x in ARTIFACTS if os.path.exists(os.path.join(data_dir, x))]
+
+
+def hashed_name(filename, digest):
+    stem, extension = os.path.splitext(os.path.basename(filename))
+    return f"{stem}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def publish_file(filename, data_dir=DATA_DIR):
+    # Returns the file's manifest entry, only writing (and compressing) content that hasn't been published before
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    digest = hashlib.sha256(data).hexdigest()
+    relative = f"{PUBLISH_DIR}/{hashed_name(filename, digest)}"
+    entry = {"file": relative, "sha256": digest, "bytes": len(data), "encodings": {}}
+
+    out_file = os.path.join(data_dir, relative)
+    if not os.path.exists(out_file):
+        write_if_changed(out_file, data)
+        metrics.increment('published_files', outcome='written')
+    else:
+        metrics.increment('published_files', outcome='unchanged')
+
+    for encoding, suffix, compress in ENCODINGS:
+        if not os.path.exists(out_file + suffix):
+            with metrics.timer('compress', encoding=encoding):
+                compressed = compress(data)
+            if compressed is None:
+                continue
+            write_if_changed(out_file + suffix, compressed)
+
+        entry["encodings"][encoding] = {"file": relative + suffix, "bytes": os.path.getsize(out_file + suffix)}
+
+    return entry
+
+
+def load_manifest(data_dir=DATA_DIR):
+    try:
+        with open(os.path.join(data_dir, MANIFEST_FILE), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": FORMAT_VERSION, "files": {}}
+
+
+def manifest_files(manifest):
+    return set(y["file"] for x in manifest["files"].values() for y in [x] + list(x["encodings"].values()))
+
+
+def publish(data_dir=DATA_DIR):
+    os.makedirs(os.path.join(data_dir, PUBLISH_DIR), exist_ok=True)
+    previous = load_manifest(data_dir)
+
+    manifest = {"version": FORMAT_VERSION, "files": {os.path.basename(x): publish_file(x, data_dir) for x in find_artifacts(data_dir)}}
+
+    # The rename inside write_if_changed is the swap
+    changed = write_if_changed(os.path.join(data_dir, MANIFEST_FILE), json.dumps(manifest, indent=1, sort_keys=True))
+
+    # Only prune once the new manifest is in place, keeping whatever the previous one pointed at. An unchanged
+    # manifest keeps the retained set as it was.
+    if changed:
+        keep = manifest_files(manifest) | manifest_files(previous)
+        for filename in os.listdir(os.path.join(data_dir, PUBLISH_DIR)):
+            if f"{PUBLISH_DIR}/{filename}" not in keep:
+                os.remove(os.path.join(data_dir, PUBLISH_DIR, filename))
+
+    return manifest, changed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    args, _ = parser.parse_known_args()
+
+    metrics.start('publish')
+
+    manifest, changed = publish(args.data_dir)
+    encodings = sorted(set(encoding for x in manifest["files"].values() for encoding in x["encodings"]))
+    print(f"{len(manifest['files'])} files published ({', '.join(encodings) or 'no compressed copies'}), manifest {'updated' if changed else 'unchanged'}")
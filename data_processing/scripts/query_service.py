@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+import records
+
+
+# Read-only JSON queries over the pipeline outputs, served on localhost:
+#
+#   python query_service.py [--port 8010] [--transactions ../data/transactions.json] [--players ../data/players_start.csv]
+#
+#   GET /transactions?team=BOS&player=...&type=traded&start=2021-03-01&end=2021-03-31&offset=0&limit=100
+#   GET /players/<player_id>                 starting record plus every team the player passed through
+#   GET /teams/<team_id>/roster?date=...     player ids on the roster after that date's moves (pre-season if no date)
+#   GET /status
+#
+# The files are loaded once into a TransactionIndex: transaction positions by team, player, type and date, so a query
+# intersects a few sorted lists instead of scanning every transaction. Responses are kept in an LRU cache. Before
+# answering, the service checks (at most every reload_interval seconds) whether either file was replaced. If one was,
+# it builds a new index, swaps it in and drops the cache. Writers replace files atomically (artifacts.write_if_changed),
+# so a reload never sees a half-written file. QueryService.get() answers without going through HTTP, and make_server()
+# with port=0 binds a free port, so both can be used from tests with nothing else running.
+
+DEFAULT_TRANSACTIONS = '../data/transactions.json'
+DEFAULT_PLAYERS = '../data/players_start.csv'
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class TransactionIndex:
+    def __init__(self, transactions, players):
+        # Positions below index self.transactions, which is kept in date order
+        self.transactions = sorted(transactions, key=lambda x: x.date)
+        self.players = players
+        self.dates = [x.date for x in self.transactions]
+
+        self.by_team = defaultdict(list)
+        self.by_player = defaultdict(list)
+        self.by_type = defaultdict(list)
+        # player_id -> [(date, to_team)] in transaction order
+        self.player_moves = defaultdict(list)
+
+        for i, transaction in enumerate(self.transactions):
+            self.by_type[transaction.type].append(i)
+            for team_id in dict.fromkeys(transaction.affected_teams):
+                self.by_team[team_id].append(i)
+
+            for move in transaction.players:
+                if not self.by_player[move.player_id] or self.by_player[move.player_id][-1] != i:
+                    self.by_player[move.player_id].append(i)
+                self.player_moves[move.player_id].append((transaction.date, move.to_team))
+
+    @classmethod
+    def load(cls, transactions_file, players_file):
+        return cls(records.load_transactions(transactions_file), records.load_players(players_file))
+
+    def find(self, team=None, player=None, type=None, start=None, end=None):
+        # Returns matching positions in date order
+        lo = 0 if start is None else bisect_left(self.dates, start)
+        hi = len(self.dates) if end is None else bisect_right(self.dates, end)
+
+        candidates = [index.get(key, []) for index, key in [(self.by_team, team), (self.by_player, player), (self.by_type, type)] if key is not None]
+        if not candidates:
+            return list(range(lo, hi))
+
+        # Narrow the smallest list to the date range, then check the rest by membership
+        candidates.sort(key=len)
+        positions = candidates[0][bisect_left(candidates[0], lo):bisect_left(candidates[0], hi)]
+        for other in candidates[1:]:
+            other = set(other)
+            positions = [x for x in positions if x in other]
+
+        return positions
+
+    def team_of(self, player_id, date=None):
+        moves = self.player_moves.get(player_id, [])
+        if date is not None:
+            moves = moves[:bisect_right(moves, (date, chr(0x10ffff)))]
+
+        if moves:
+            return moves[-1][1]
+        return self.players[player_id].team_id if player_id in self.players else None
+
+    def roster_at(self, team_id, date=None):
+        player_ids = set(self.players) | set(self.player_moves)
+        return sorted(x for x in player_ids if self.team_of(x, date) == team_id)
+
+    def player_path(self, player_id):
+        # Consecutive stops only: moves that leave a player where they were (extensions, options) don't add one
+        path = []
+        if player_id in self.players:
+            path.append({"team_id": self.players[player_id].team_id, "date": None})
+
+        for date, team_id in self.player_moves.get(player_id, []):
+            if not path or path[-1]["team_id"] != team_id:
+                path.append({"team_id": team_id, "date": date})
+
+        return path
+
+
+class ResponseCache:
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def file_signature(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def single(params, name, pattern=None):
+    values = params.get(name)
+    if not values:
+        return None
+    if len(values) > 1:
+        raise QueryError(400, f"{name} can only be given once")
+    if pattern and not pattern.match(values[0]):
+        raise QueryError(400, f"{name} must look like YYYY-MM-DD")
+    return values[0]
+
+
+def page_bounds(params):
+    try:
+        offset = int(single(params, 'offset') or 0)
+        limit = int(single(params, 'limit') or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        raise QueryError(400, "offset and limit must be integers")
+
+    if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+        raise QueryError(400, f"offset must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}")
+    return offset, limit
+
+
+def check_params(params, allowed):
+    unknown = sorted(set(params) - set(allowed))
+    if unknown:
+        raise QueryError(400, f"Unknown parameter(s): {', '.join(unknown)}")
+
+
+class QueryService:
+    def __init__(self, transactions_file=DEFAULT_TRANSACTIONS, players_file=DEFAULT_PLAYERS, cache_size=DEFAULT_CACHE_SIZE, reload_interval=1.0):
+        self.files = [transactions_file, players_file]
+        self.cache = ResponseCache(cache_size)
+        self.reload_interval = reload_interval
+        self.reload_lock = threading.Lock()
+        self.generation = 0
+        self.index = None
+        self.signatures = None
+        self.checked_at = 0
+        self.reload(force=True)
+
+    def reload(self, force=False):
+        # Returns True if a new index was swapped in. A failed reload keeps serving the previous index.
+        with self.reload_lock:
+            self.checked_at = time.monotonic()
+            signatures = [file_signature(x) for x in self.files]
+            if not force and signatures == self.signatures:
+                return False
+
+            try:
+                with metrics.timer('query_reload'):
+                    index = TransactionIndex.load(*self.files)
+            except (OSError, ValueError, KeyError) as e:
+                if self.index is None:
+                    raise
+                # Not retried until the file changes again
+                self.signatures = signatures
+                print(f"Reload failed, still serving generation {self.generation}: {e}")
+                metrics.increment('query_reloads', outcome='failed')
+                return False
+
+            self.index = index
+            self.signatures = signatures
+            self.generation += 1
+            self.loaded_at = time.time()
+            self.cache.clear()
+            metrics.increment('query_reloads', outcome='loaded')
+            return True
+
+    def maybe_reload(self):
+        if time.monotonic() - self.checked_at >= self.reload_interval:
+            self.reload()
+
+    def get(self, target):
+        # target is a request path with its query string. Returns (status, body bytes, cache outcome).
+        self.maybe_reload()
+
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        # Same query in any parameter order shares a cache entry
+        key = (self.generation, url.path.rstrip('/'), tuple(sorted((k, tuple(v)) for k, v in params.items())))
+
+        cached = self.cache.get(key)
+        if cached:
+            return cached + ('hit',)
+
+        index = self.index
+        try:
+            status, payload = 200, self.route(index, url.path.rstrip('/'), params)
+        except QueryError as e:
+            status, payload = e.status, {"error": str(e)}
+
+        response = (status, json.dumps(payload).encode('utf-8'))
+        if status == 200:
+            self.cache.put(key, response)
+        return response + ('miss',)
+
+    def route(self, index, path, params):
+        parts = [x for x in path.split('/') if x]
+
+        if parts == ['transactions']:
+            check_params(params, ['team', 'player', 'type', 'start', 'end', 'offset', 'limit'])
+            offset, limit = page_bounds(params)
+            positions = index.find(
+                team=single(params, 'team'),
+                player=single(params, 'player'),
+                type=single(params, 'type'),
+                start=single(params, 'start', DATE),
+                end=single(params, 'end', DATE)
+            )
+            return {
+                "count": len(positions),
+                "offset": offset,
+                "transactions": [index.transactions[i].to_json() for i in positions[offset:offset + limit]]
+            }
+
+        if len(parts) == 2 and parts[0] == 'players':
+            check_params(params, [])
+            player_id = parts[1]
+            if player_id not in index.players and player_id not in index.player_moves:
+                raise QueryError(404, f"Unknown player: {player_id}")
+
+            player = index.players.get(player_id)
+            return {
+                "player_id": player_id,
+                "player": player.player if player else None,
+                "position": player.position if player else None,
+                "start_team": player.team_id if player else None,
+                "current_team": index.team_of(player_id),
+                "teams": index.player_path(player_id),
+                "transaction_ids": [index.transactions[i].id for i in index.by_player.get(player_id, [])]
+            }
+
+        if len(parts) == 3 and parts[0] == 'teams' and parts[2] == 'roster':
+            check_params(params, ['date'])
+            date = single(params, 'date', DATE)
+            return {"team_id": parts[1], "date": date, "players": index.roster_at(parts[1], date)}
+
+        if parts == ['status']:
+            check_params(params, [])
+            return {
+                "generation": self.generation,
+                "loaded_at": self.loaded_at,
+                "transactions": len(index.transactions),
+                "players": len(index.players),
+                "cached_responses": len(self.cache.entries)
+            }
+
+        raise QueryError(404, f"No such endpoint: {path or '/'}")
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        with metrics.timer('query_request'):
+            status, body, cache = self.service.get(self.path)
+        metrics.increment('query_requests', status=status, cache=cache)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Cache', cache)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=0):
+    # port=0 picks a free port; the bound one is server.server_address[1]
+    handler = type('Handler', (QueryHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--transactions', default=DEFAULT_TRANSACTIONS)
+    parser.add_argument('--players', default=DEFAULT_PLAYERS)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE)
+    parser.add_argument('--reload-interval', type=float, default=1.0, help="Seconds between checks for replaced input files")
+    args, _ = parser.parse_known_args()
+
+    metrics.start('query_service')
+
+    service = QueryService(args.transactions, args.players, args.cache_size, args.reload_interval)
+    server = make_server(service, args.host, args.port)
+    print(f"Serving {len(service.index.transactions)} transactions on http://{args.host}:{server.server_address[1]}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
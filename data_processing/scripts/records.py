@@ -0,0 +1,277 @@
+import csv
+import io
+import json
+import math
+import re
+from array import array
+
+from artifacts import write_if_changed
+
+
+# Typed records for players and transactions, parsed once when a file is loaded.
+#
+# A Player keeps the columns the scripts actually work with as typed attributes (NAMED_FIELDS) and everything else in
+# two vectors shared out by a PlayerSchema: numeric stat columns in an array of doubles (NaN where missing) and the rest
+# as strings. The schema is inferred from the file, and a column is only treated as numeric if every value in it comes
+# back out of format_number() exactly as it went in, so writing a loaded file reproduces it.
+
+NAMED_FIELDS = {
+    'player_id': 'player_id',
+    'player': 'player',
+    'team_id': 'team_id',
+    'position': 'position',
+    'img_link': 'img_link',
+    '2021_preseason_salary': 'preseason_salary'
+}
+
+NUMBER = re.compile(r'-?(\d+)?(?:\.(\d+))?')
+# Per-season columns are prefixed with the season's end year, e.g. 2021_pos
+SEASON_FIELD = re.compile(r'(\d{4})_')
+
+
+def parse_int(value):
+    return int(value) if value not in ('', None) else None
+
+
+def number_format(value):
+    # (decimal places, has a leading zero) for a plain decimal string like "12", "0.5", ".592" or "-.012", else None
+    match = NUMBER.fullmatch(value)
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+
+    return len(match.group(2) or ''), match.group(1) is not None
+
+
+def format_number(value, decimals, leading_zero):
+    if math.isnan(value):
+        return ''
+
+    text = f"{value:.{decimals}f}"
+    if not leading_zero and decimals:
+        if text.startswith('0.'):
+            text = text[1:]
+        elif text.startswith('-0.'):
+            text = '-' + text[2:]
+
+    return text
+
+
+class PlayerSchema:
+    def __init__(self, fields, stat_formats):
+        # stat_formats: {field: (decimals, leading_zero)} for the numeric columns. Anything else that isn't a named field is text.
+        self.fields = []
+        self.stat_fields = []
+        self.stat_formats = []
+        self.text_fields = []
+        self.stat_index = {}
+        self.text_index = {}
+
+        for field in fields:
+            self.add_field(field, stat_formats.get(field))
+
+    def add_field(self, field, stat_format=None):
+        # New named fields only need a column; stat/text columns can't be added once players have been built
+        if field in self.fields:
+            return
+
+        self.fields.append(field)
+        if field in NAMED_FIELDS:
+            return
+
+        if stat_format:
+            self.stat_index[field] = len(self.stat_fields)
+            self.stat_fields.append(field)
+            self.stat_formats.append(stat_format)
+        else:
+            self.text_index[field] = len(self.text_fields)
+            self.text_fields.append(field)
+
+    def is_stat(self, field):
+        return field in self.stat_index
+
+    def seasons(self):
+        # Seasons the file has columns for (get_players.py's --start-year to --end-year), oldest first
+        return sorted(set(int(x[:4]) for x in self.fields if x not in NAMED_FIELDS and SEASON_FIELD.match(x)))
+
+    @classmethod
+    def infer(cls, fields, rows):
+        stat_formats = {}
+        for field in fields:
+            if field in NAMED_FIELDS:
+                continue
+
+            present = [row[field] for row in rows if row.get(field, '') != '']
+            formats = [number_format(x) for x in present]
+            if not present or None in formats:
+                continue
+
+            stat_format = (max(x[0] for x in formats), all(x[1] for x in formats))
+            if all(format_number(float(x), *stat_format) == x for x in present):
+                stat_formats[field] = stat_format
+
+        return cls(fields, stat_formats)
+
+
+class Player:
+    __slots__ = ('schema', 'player_id', 'player', 'team_id', 'position', 'img_link', 'preseason_salary', 'current_salary', 'stats', 'text')
+
+    def __init__(self, schema, player_id, player='', team_id='', position='', img_link='', preseason_salary=None, stats=None, text=None):
+        self.schema = schema
+        self.player_id = player_id
+        self.player = player
+        self.team_id = team_id
+        self.position = position
+        self.img_link = img_link
+        self.preseason_salary = preseason_salary
+        # Salary as of the current point in a transaction replay, starting from the preseason salary
+        self.current_salary = preseason_salary or 0
+        self.stats = stats if stats is not None else array('d', [math.nan] * len(schema.stat_fields))
+        self.text = text if text is not None else [''] * len(schema.text_fields)
+
+    @classmethod
+    def from_row(cls, schema, row):
+        return cls(
+            schema,
+            row['player_id'],
+            row.get('player', ''),
+            row.get('team_id', ''),
+            row.get('position', ''),
+            row.get('img_link', ''),
+            parse_int(row.get('2021_preseason_salary', '')),
+            array('d', [float(row[x]) if row.get(x, '') != '' else math.nan for x in schema.stat_fields]),
+            [row.get(x, '') for x in schema.text_fields]
+        )
+
+    def copy(self):
+        # Replays only change team_id/current_salary, so the stat and text vectors are shared rather than copied
+        player = Player(self.schema, self.player_id, self.player, self.team_id, self.position, self.img_link, self.preseason_salary, self.stats, self.text)
+        player.current_salary = self.current_salary
+        return player
+
+    def get(self, field):
+        # Typed value of any column: float (or None) for stats, int (or None) for 2021_preseason_salary, str otherwise
+        if field in NAMED_FIELDS:
+            return getattr(self, NAMED_FIELDS[field])
+
+        if field in self.schema.stat_index:
+            value = self.stats[self.schema.stat_index[field]]
+            return None if math.isnan(value) else value
+
+        return self.text[self.schema.text_index[field]]
+
+    def formatted(self, field):
+        # A column as it's written to csv
+        if field == '2021_preseason_salary':
+            return '' if self.preseason_salary is None else str(self.preseason_salary)
+        elif field in NAMED_FIELDS:
+            return getattr(self, NAMED_FIELDS[field])
+        elif field in self.schema.stat_index:
+            i = self.schema.stat_index[field]
+            return format_number(self.stats[i], *self.schema.stat_formats[i])
+
+        return self.text[self.schema.text_index[field]]
+
+    def row(self):
+        return {field: self.formatted(field) for field in self.schema.fields}
+
+
+def players_from_rows(rows):
+    # Builds records from csv-style string dicts, with columns ordered as they first appear. Returns {player_id: Player}.
+    fields = {}
+    for row in rows:
+        fields.update(dict.fromkeys(row))
+
+    schema = PlayerSchema.infer(list(fields), rows)
+    return {row['player_id']: Player.from_row(schema, row) for row in rows}
+
+
+def load_players(filename):
+    with open(filename, 'r', encoding='utf-8-sig') as f:
+        return players_from_rows(list(csv.DictReader(f)))
+
+
+def write_players(players, filenames):
+    players = list(players)
+
+    f = io.StringIO()
+    out_csv = csv.DictWriter(f, fieldnames=players[0].schema.fields)
+    out_csv.writeheader()
+    for player in players:
+        out_csv.writerow(player.row())
+
+    for filename in filenames:
+        write_if_changed(filename, f.getvalue())
+
+
+class Move:
+    __slots__ = ('player_id', 'from_team', 'to_team')
+
+    def __init__(self, player_id, from_team, to_team):
+        self.player_id = player_id
+        self.from_team = from_team
+        self.to_team = to_team
+
+    def to_json(self):
+        return {"player_id": self.player_id, "from_team": self.from_team, "to_team": self.to_team}
+
+
+class SalaryChange:
+    __slots__ = ('start_salary', 'end_salary')
+
+    def __init__(self, start_salary, end_salary):
+        self.start_salary = int(start_salary)
+        self.end_salary = int(end_salary)
+
+    def to_json(self):
+        return {"start_salary": self.start_salary, "end_salary": self.end_salary}
+
+
+class Transaction:
+    __slots__ = ('id', 'type', 'date', 'players', 'affected_teams', 'text', 'salary_data')
+
+    def __init__(self, id, type, date, players, affected_teams, text, salary_data=None):
+        self.id = id
+        self.type = type
+        self.date = date
+        self.players = players
+        self.affected_teams = affected_teams
+        self.text = text
+        self.salary_data = salary_data
+
+    def to_json(self):
+        transaction = {
+            "id": self.id,
+            "type": self.type,
+            "date": self.date,
+            "players": [x.to_json() for x in self.players],
+            "affected_teams": self.affected_teams,
+            "text": self.text
+        }
+
+        if self.salary_data:
+            transaction['salary_data'] = self.salary_data.to_json()
+
+        return transaction
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data['id'],
+            data['type'],
+            data['date'],
+            [Move(x['player_id'], x['from_team'], x['to_team']) for x in data['players']],
+            data['affected_teams'],
+            data['text'],
+            SalaryChange(data['salary_data']['start_salary'], data['salary_data']['end_salary']) if 'salary_data' in data else None
+        )
+
+
+def load_transactions(filename):
+    with open(filename, 'r') as f:
+        return [Transaction.from_json(x) for x in json.load(f)]
+
+
+def dump_transactions(transactions, filenames):
+    data = json.dumps([x.to_json() for x in transactions])
+    for filename in filenames:
+        write_if_changed(filename, data)
@@ -1,4 +1 @@
-python get_players.py
-python get_initial_rosters.py
-python get_table_transactions.py
-python get_transactions.py
\ No newline at end of file
+python pipeline.py "$@"
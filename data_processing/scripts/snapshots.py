@@ -0,0 +1,98 @@
+import json
+from bisect import bisect_right
+from functools import lru_cache
+
+import records
+from artifacts import write_if_changed
+
+
+# Every team's roster as of any date, without replaying transactions.json from players_start.csv.
+# The file holds a full player -> team keyframe every KEYFRAME_INTERVAL transaction dates plus, for every date, the
+# moves made that day. Rebuilding any date costs at most one keyframe copy and KEYFRAME_INTERVAL days of diffs.
+
+KEYFRAME_INTERVAL = 10
+
+
+def build_snapshots(start_rosters, transactions, keyframe_interval=KEYFRAME_INTERVAL):
+    # start_rosters: {player_id: team_id} before the first transaction. The state for a date includes that day's moves.
+    diffs = {}
+    for transaction in transactions:
+        diffs.setdefault(transaction.date, []).extend([x.player_id, x.to_team] for x in transaction.players)
+
+    rosters = dict(start_rosters)
+    keyframes = [{"date": None, "rosters": dict(rosters)}]
+    for i, date in enumerate(sorted(diffs)):
+        for player_id, team_id in diffs[date]:
+            rosters[player_id] = team_id
+
+        if (i + 1) % keyframe_interval == 0:
+            keyframes.append({"date": date, "rosters": dict(rosters)})
+
+    return {"keyframe_interval": keyframe_interval, "keyframes": keyframes, "diffs": diffs}
+
+
+def write_snapshots(players_file, transactions, out_files):
+    start_rosters = {player_id: player.team_id for player_id, player in records.load_players(players_file).items()}
+
+    data = json.dumps(build_snapshots(start_rosters, transactions), separators=(',', ':'))
+    for filename in out_files:
+        write_if_changed(filename, data)
+
+
+class RosterTimeline:
+    def __init__(self, snapshots):
+        self.keyframes = snapshots['keyframes']
+        self.keyframe_dates = [x['date'] for x in self.keyframes[1:]]
+        self.diffs = snapshots['diffs']
+        self.diff_dates = sorted(self.diffs)
+
+    @classmethod
+    def load(cls, filename='../data/roster_snapshots.json'):
+        with open(filename, 'r') as f:
+            return cls(json.load(f))
+
+    def nearest_keyframe(self, date):
+        # Latest keyframe on or before date (index 0 is the pre-season state)
+        return self.keyframes[bisect_right(self.keyframe_dates, date)]
+
+    def diffs_between(self, start_date, end_date):
+        start = 0 if start_date is None else bisect_right(self.diff_dates, start_date)
+        end = bisect_right(self.diff_dates, end_date)
+        return self.diff_dates[start:end]
+
+    def rosters_at(self, date):
+        keyframe = self.nearest_keyframe(date)
+        rosters = dict(keyframe['rosters'])
+
+        for diff_date in self.diffs_between(keyframe['date'], date):
+            for player_id, team_id in self.diffs[diff_date]:
+                rosters[player_id] = team_id
+
+        return rosters
+
+    def team_of(self, player_id, date):
+        keyframe = self.nearest_keyframe(date)
+
+        # Walk back from date to the keyframe, so only that player's latest move matters
+        for diff_date in reversed(self.diffs_between(keyframe['date'], date)):
+            for moved_player_id, team_id in reversed(self.diffs[diff_date]):
+                if moved_player_id == player_id:
+                    return team_id
+
+        return keyframe['rosters'].get(player_id)
+
+    def roster_at(self, team_id, date):
+        return sorted(player_id for player_id, player_team_id in self.rosters_at(date).items() if player_team_id == team_id)
+
+
+@lru_cache(maxsize=1)
+def default_timeline():
+    return RosterTimeline.load()
+
+
+def roster_at(team_id, date, timeline=None):
+    return (timeline or default_timeline()).roster_at(team_id, date)
+
+
+def team_of(player_id, date, timeline=None):
+    return (timeline or default_timeline()).team_of(player_id, date)
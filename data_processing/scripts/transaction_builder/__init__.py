@@ -0,0 +1,15 @@
+from .build import build_transactions, iter_dates, process_date
+from .context import BuildContext, build_player_index, build_team_index
+from .dedup import DedupIndex
+from .processors import (
+    TRANSACTION_TYPES,
+    find_player,
+    find_team,
+    commit_transaction,
+    format_transaction_id,
+    process_bbref_transaction,
+    process_multi_team,
+    process_prosports_transaction,
+    process_trade
+)
+from .sources import get_transaction_dates, load_players, load_prosports_transactions, load_team_data
@@ -0,0 +1,84 @@
+from collections import defaultdict
+from datetime import datetime
+
+import metrics
+
+from .processors import process_bbref_transaction, process_prosports_transaction
+from .sources import get_transaction_dates
+
+
+def group_by_date(prosports_transactions):
+    prosports_by_date = defaultdict(list)
+    for transaction in prosports_transactions:
+        prosports_by_date[transaction['date']].append(transaction)
+
+    return prosports_by_date
+
+
+def iter_dates(transaction_dates):
+    # bbref lists newest first. Yields (date <li>, YYYY-MM-DD) oldest first, skipping undated entries.
+    for date in transaction_dates[::-1]:
+        date_string = date.find("span").text
+
+        if date_string == "?":
+            continue
+
+        yield date, datetime.strftime(datetime.strptime(date_string, "%B %d, %Y"), "%Y-%m-%d")
+
+
+def process_date(context, date, formatted_date, prosports_by_date):
+    # Process one bbref date <li> plus that day's prosports rows and return the new Transaction records, in the order they happened
+    date_transactions = []
+
+    prosports_date_transactions = prosports_by_date.get(formatted_date, [])
+    prosports_waivers = [x for x in prosports_date_transactions if 'waived' in x['notes'] or 'claimed' in x['notes']]
+    prosports_nonwaivers = [x for x in prosports_date_transactions if 'waived' not in x['notes'] and 'claimed' not in x['notes']]
+
+    for transaction in prosports_nonwaivers:
+        transaction_record = process_prosports_transaction(context, transaction)
+        if transaction_record:
+            date_transactions.append(transaction_record)
+
+    bbref_transactions = date.find_all("p")
+    for transaction in bbref_transactions:
+        transaction_text = transaction.text
+
+        if " hired " in transaction_text or "Exhibit 10" in transaction_text or "two-way contract" in transaction_text:
+            continue
+        else:
+            transaction_record = process_bbref_transaction(context, transaction, transaction_text, formatted_date)
+            if transaction_record:
+                date_transactions.append(transaction_record)
+
+    for transaction in prosports_waivers:
+        transaction_record = process_prosports_transaction(context, transaction)
+        if transaction_record:
+            date_transactions.append(transaction_record)
+
+    return date_transactions
+
+
+def build_transactions(bbref_source, prosports_source, start_state, after_date='', on_date=None, collect=True):
+    # bbref_source: transactions page HTML (or its already-parsed date <li>s). prosports_source: prosports rows, already
+    # filtered (see sources.load_prosports_transactions). start_state: BuildContext, which is left untouched.
+    # Only dates after after_date are processed; on_date(formatted_date, date_transactions, context) runs after each one.
+    # Returns (transactions, end_state). With collect=False transactions is left empty, for callers that consume each
+    # date's transactions in on_date and don't want the whole season held in memory.
+    context = start_state.copy()
+    transaction_dates = get_transaction_dates(bbref_source) if isinstance(bbref_source, str) else bbref_source
+    prosports_by_date = group_by_date(prosports_source)
+
+    transactions = []
+    for date, formatted_date in iter_dates(transaction_dates):
+        if formatted_date <= after_date:
+            continue
+
+        with metrics.timer('process'):
+            date_transactions = process_date(context, date, formatted_date, prosports_by_date)
+        if collect:
+            transactions += date_transactions
+
+        if on_date:
+            on_date(formatted_date, date_transactions, context)
+
+    return transactions, context
@@ -0,0 +1,80 @@
+import json
+import os
+
+from records import Transaction
+
+
+CHECKPOINT_DIR = '../data/checkpoints'
+
+
+def checkpoint_paths(season):
+    return f"{CHECKPOINT_DIR}/{season}_state.json", f"{CHECKPOINT_DIR}/{season}_transactions.jsonl"
+
+
+def iter_journal(journal_file):
+    if not os.path.exists(journal_file):
+        return
+
+    with open(journal_file, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield Transaction.from_json(json.loads(line))
+
+
+def truncate_journal(journal_file, length):
+    if os.path.exists(journal_file) and os.path.getsize(journal_file) > length:
+        os.truncate(journal_file, length)
+
+
+def load_checkpoint(season, stream=False):
+    # Resumes from the state *before* the last checkpointed date, so that date is always replayed: bbref/prosports
+    # entries posted later on the same day get picked up, and a run killed while saving can't leave that date's
+    # transactions in the journal twice. The journal is cut back to the length recorded with that state before
+    # anything is appended to it. Returns (resume point or None, the season's transactions up to it); with
+    # stream=True the transactions come back as a generator over the journal instead of a list.
+    state_file, journal_file = checkpoint_paths(season)
+    checkpoint = None
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            checkpoint = json.load(f)
+
+    # No earlier date to resume from (or a state file from before this format): the season is rebuilt from its start
+    resume = checkpoint.get('previous') if checkpoint else None
+    truncate_journal(journal_file, resume['journal_bytes'] if resume else 0)
+    if not resume:
+        return None, []
+
+    season_transactions = iter_journal(journal_file)
+    return resume, season_transactions if stream else list(season_transactions)
+
+
+def save_checkpoint(season, last_date, date_transactions, context, previous=None):
+    # previous: the resume point returned by load_checkpoint or by the last save_checkpoint call (None for a season's
+    # first date). Returns this date's resume point, to pass to the next call.
+    state_file, journal_file = checkpoint_paths(season)
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+
+    with open(journal_file, 'ab') as f:
+        for transaction in date_transactions:
+            f.write((json.dumps(transaction.to_json()) + '\n').encode('utf-8'))
+        journal_bytes = f.tell()
+
+    latest = {
+        "last_date": last_date,
+        "rosters": context.rosters(),
+        "dedup": context.dedup.to_json(),
+        "journal_bytes": journal_bytes
+    }
+    checkpoint = {"season": season, "latest": latest, "previous": previous}
+
+    with open(state_file + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(state_file + '.tmp', state_file)
+
+    return latest
+
+
+def reset_checkpoint(season):
+    for filename in checkpoint_paths(season):
+        if os.path.exists(filename):
+            os.remove(filename)
@@ -0,0 +1,52 @@
+from .dedup import DedupIndex
+
+
+def normalize_name(name):
+    return ' '.join(str(name).split())
+
+
+def build_player_index(player_dict):
+    # Name -> (roster order, player_id). Keeps the first player for a repeated name, matching the old linear scan.
+    player_index = {}
+    for i, (player_id, player) in enumerate(player_dict.items()):
+        player_index.setdefault(normalize_name(player.player), (i, player_id))
+
+    return player_index
+
+
+def build_team_index(team_data):
+    team_index = {normalize_name(team['team_nickname']): team for team in team_data}
+    team_index['Blazers'] = team_index.get('Trailblazers')
+
+    return team_index
+
+
+class BuildContext:
+    # Everything the processors read and update while replaying transactions: current rosters/salaries (player_dict),
+    # the name and nickname lookups, and the transactions already emitted (dedup). Processors take one of these instead of module globals.
+
+    def __init__(self, player_dict, team_data, dedup=None, player_index=None, team_index=None):
+        self.player_dict = player_dict
+        self.team_data = team_data
+        self.dedup = dedup if dedup is not None else DedupIndex()
+        self.player_index = player_index if player_index is not None else build_player_index(player_dict)
+        self.team_index = team_index if team_index is not None else build_team_index(team_data)
+
+    def copy(self):
+        # Player records are copied since processors mutate them. The indexes only depend on names, so they're shared.
+        return BuildContext(
+            {player_id: player.copy() for player_id, player in self.player_dict.items()},
+            self.team_data,
+            self.dedup.copy(),
+            self.player_index,
+            self.team_index
+        )
+
+    def rosters(self):
+        return {player_id: [player.team_id, player.current_salary] for player_id, player in self.player_dict.items()}
+
+    def restore_rosters(self, rosters):
+        for player_id, (team_id, current_salary) in rosters.items():
+            if player_id in self.player_dict:
+                self.player_dict[player_id].team_id = team_id
+                self.player_dict[player_id].current_salary = int(current_salary)
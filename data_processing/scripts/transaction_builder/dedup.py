@@ -0,0 +1,88 @@
+from collections import defaultdict
+from datetime import date
+
+
+# Days apart two reports of the same move can be and still count as one transaction. bbref and prosports sometimes
+# date the same signing/waiver a day or two differently.
+DEFAULT_WINDOW_DAYS = 3
+
+
+def fuzzy_key(transaction):
+    # from_team is left out on purpose: by the time the second report arrives the first has already moved the player,
+    # so its from_team is the destination team rather than the original one
+    return (transaction.type, tuple(sorted((x.player_id, x.to_team) for x in transaction.players)))
+
+
+def days_apart(date_a, date_b):
+    return abs((date.fromisoformat(date_a) - date.fromisoformat(date_b)).days)
+
+
+class DedupIndex:
+    # Every emitted transaction id (-> date, source), plus a (type, player moves) -> [(date, id, source)] index for fuzzy matches.
+    # Each rejected duplicate is recorded in merges along with the source whose copy was kept.
+
+    def __init__(self, window_days=DEFAULT_WINDOW_DAYS):
+        self.window_days = window_days
+        self.ids = {}
+        self.by_key = defaultdict(list)
+        self.merges = []
+
+    def copy(self):
+        index = DedupIndex(self.window_days)
+        index.ids = dict(self.ids)
+        index.by_key = defaultdict(list, {key: list(entries) for key, entries in self.by_key.items()})
+        index.merges = list(self.merges)
+        return index
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self.ids
+
+    def find_duplicate(self, transaction, rosters):
+        if transaction.id in self.ids:
+            kept_date, kept_source = self.ids[transaction.id]
+            return (kept_date, transaction.id, kept_source), 'exact'
+
+        # Only a no-op repeat can be a fuzzy duplicate: if any player isn't already where this move would put them,
+        # something happened in between (e.g. signed, waived, re-signed) and it's a real transaction
+        if not transaction.players or any(rosters[x.player_id].team_id != x.to_team for x in transaction.players):
+            return None, None
+
+        for entry in self.by_key.get(fuzzy_key(transaction), []):
+            if days_apart(entry[0], transaction.date) <= self.window_days:
+                return entry, 'fuzzy'
+
+        return None, None
+
+    def accept(self, transaction, source, rosters):
+        # Returns True if transaction is new and records it, or False and logs the merge if it duplicates an earlier one
+        kept, match = self.find_duplicate(transaction, rosters)
+        if kept:
+            self.merges.append({
+                "date": transaction.date,
+                "match": match,
+                "kept_id": kept[1],
+                "kept_source": kept[2],
+                "dropped_id": transaction.id,
+                "dropped_source": source
+            })
+            return False
+
+        self.ids[transaction.id] = (transaction.date, source)
+        self.by_key[fuzzy_key(transaction)].append((transaction.date, transaction.id, source))
+        return True
+
+    def to_json(self):
+        return {
+            "window_days": self.window_days,
+            "entries": [[entry[0], entry[1], entry[2], key[0], key[1]] for key, entries in self.by_key.items() for entry in entries],
+            "merges": list(self.merges)
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        index = cls(data['window_days'])
+        for transaction_date, transaction_id, source, transaction_type, moves in data['entries']:
+            index.ids[transaction_id] = (transaction_date, source)
+            index.by_key[(transaction_type, tuple(tuple(x) for x in moves))].append((transaction_date, transaction_id, source))
+        index.merges = list(data['merges'])
+        return index
@@ -0,0 +1,233 @@
+import metrics
+from records import Move, SalaryChange, Transaction
+
+from .context import normalize_name
+
+
+TRANSACTION_TYPES = ['exercised', 'declined contract option', 'contract extension', 'signed', 'waived', 'claimed', '-team trade', 'traded']
+
+
+def process_multi_team(context, transaction_element):
+    all_links = transaction_element.find_all("a")
+
+    breakpoints = []
+    for i, link in enumerate(all_links):
+        if 'data-attr-from' in link.attrs:
+            breakpoints.append(i)
+    
+    players = []
+    for i, point in enumerate(breakpoints):
+        if i == len(breakpoints)-1:
+            link_chunk = all_links[point:]
+        else:
+            link_chunk = all_links[point:breakpoints[i+1]]
+        
+        players += process_trade(context, link_chunk)
+    
+    return players
+
+
+def process_trade(context, links):
+    players = []
+
+    for i, link in enumerate(links):
+        if 'data-attr-from' in link.attrs:
+            from_team_id = link['data-attr-from']
+            from_team_index = i
+        elif 'data-attr-to' in link.attrs:
+            to_team_id = link['data-attr-to']
+            to_team_index = i
+    
+    for link in links[from_team_index+1:to_team_index]:
+        player_id = link['href'].split('/')[-1].replace('.html', '')
+        if player_id in context.player_dict.keys():
+            players.append(Move(player_id, context.player_dict[player_id].team_id, to_team_id))
+
+    for link in links[to_team_index+1:]:
+        player_id = link['href'].split('/')[-1].replace('.html', '')
+        if player_id in context.player_dict.keys():
+            players.append(Move(player_id, context.player_dict[player_id].team_id, from_team_id))
+
+    return players
+
+
+def format_transaction_id(transaction_type, formatted_date, player_data):
+    return f"{transaction_type}_{formatted_date}_{'-'.join(sorted([x.player_id for x in player_data]))}"
+
+
+def commit_transaction(context, transaction, source):
+    # Drop the transaction if either source already reported it, otherwise apply its moves (and salary change) to the rosters
+    if not context.dedup.accept(transaction, source, context.player_dict):
+        metrics.increment('transactions', type=transaction.type, source=source, outcome='duplicate')
+        return None
+
+    metrics.increment('transactions', type=transaction.type, source=source, outcome='kept')
+
+    for player in transaction.players:
+        context.player_dict[player.player_id].team_id = player.to_team
+
+    if transaction.salary_data:
+        context.player_dict[transaction.players[0].player_id].current_salary = transaction.salary_data.end_salary
+
+    return transaction
+    
+
+def process_bbref_transaction(context, transaction, transaction_text, formatted_date):
+    # For now, filter out G-League assignments/recalls
+    if ' recalled ' in transaction_text or ' assigned ' in transaction_text:
+        return
+
+    for phrase in TRANSACTION_TYPES:
+        if phrase in transaction_text:
+            transaction_type = phrase
+            break
+    
+    player_data = []
+
+    if transaction_type == "signed" or transaction_type == "claimed" or transaction_type == "contract extension":
+        player_id = transaction.find_all("a")[-1]['href'].split('/')[-1].replace('.html', '')
+
+        # Transaction logs don't specify two-way contracts on waiver claims, so filter these and continue here
+        if player_id not in context.player_dict.keys():
+            return
+
+        to_team = transaction.find_all("a")[0]['href'].split('/')[2]
+        player_data = [Move(player_id, context.player_dict[player_id].team_id, to_team)]
+
+    elif transaction_type == "waived":
+        player_id = transaction.find_all("a")[-1]['href'].split('/')[-1].replace('.html', '')
+
+        # Transaction logs don't specify Exhitbit 10 contracts on waives, so filter these and continue here.
+        if player_id not in context.player_dict.keys():
+            return
+
+        player_data = [Move(player_id, context.player_dict[player_id].team_id, 'FA')]
+
+    elif transaction_type == "traded":
+        links = transaction.find_all("a")
+        player_data = process_trade(context, links)
+
+    elif transaction_type == "-team trade":
+        transaction_type = "traded"
+        player_data = process_multi_team(context, transaction)
+
+    affected_teams = []
+    for player in player_data:
+        affected_teams += [player.from_team, player.to_team]
+
+    transaction_id = format_transaction_id(transaction_type, formatted_date, player_data)
+    transaction_record = Transaction(transaction_id, transaction_type, formatted_date, player_data, list(dict.fromkeys(affected_teams)), transaction_text)
+
+    return commit_transaction(context, transaction_record, 'bbref')
+
+
+def find_player(context, player_name_string):
+    # Occasionally there's more than one name option, separated by a slash and (even more rarely) there's sometimes a trailing parenthetical after name
+    name_options = [normalize_name(x.split(' (')[0]) for x in player_name_string.split(' / ')]
+    matches = [context.player_index[x] for x in name_options if x in context.player_index]
+
+    if matches:
+        return context.player_dict[min(matches)[1]]
+
+    metrics.increment('lookup_misses', kind='player')
+
+
+def find_team(context, team_name):
+    return context.team_index.get(normalize_name(team_name))
+
+
+def process_prosports_transaction(context, transaction):
+    transaction_text = transaction['notes']
+
+    for phrase in TRANSACTION_TYPES:
+        if phrase in transaction_text:
+            transaction_type = phrase
+            break
+    
+    involved_player = (transaction['relinquished'] + transaction['acquired'])[0]
+    player = find_player(context, involved_player)
+    
+    # Seems to always be g-league/exhibit 10 player
+    if not player:
+        return None
+    else:
+        player_id = player.player_id
+
+    team = find_team(context, transaction['team'])
+    team_id = team['team_id']
+    
+    affected_teams = [team_id, "FA"]
+    transaction_text = transaction['notes'] + '.'
+    salary_data = None
+    
+    if transaction_type == "exercised":
+        transaction_type = "exercised option"
+        from_team = team_id
+        to_team = team_id
+        affected_teams = [team_id]
+        
+        if transaction_text.startswith("player"):
+            transaction_text = transaction_text.replace("player", f"{player.player} ({team['team_nickname']})")
+        else:
+            transaction_text = transaction_text.replace("team exercised", f"{team['team_nickname']} exercised {player.player}'s")
+
+
+    elif transaction_type == "declined contract option":
+        transaction_type = "declined option"
+        from_team = team_id
+        to_team = "FA"
+
+        if transaction_text.startswith("player"):
+            transaction_text = transaction_text.replace("player", f"{player.player} ({team['team_nickname']})")
+        else:
+            transaction_text = transaction_text.replace("team declined", f"{team['team_nickname']} declined {player.player}'s")
+
+    elif transaction_type == "waived":
+        # If player isn't on this team in roster start, they're on a two-way or Exhibit 10 contract and this waiver shouldn't be processed
+        if player.team_id != team_id:
+            return None
+
+        from_team = team_id
+        to_team = "FA"
+
+        transaction_text = f"The {team['team_full_name']} waived {player.player}."
+    
+    elif transaction_type == "claimed":
+        from_team = player.team_id
+        to_team = team_id
+
+        affected_teams = [from_team, to_team]
+        transaction_text = f"The {team['team_full_name']} claimed {player.player} off waivers."
+
+    elif transaction_type == "signed":
+        from_team = player.team_id
+        to_team = team_id
+        affected_teams = [from_team, to_team]
+
+        contract_clause = transaction_text.split(' to a ')[-1]
+
+        if '-year' not in transaction_text:
+            verb = contract_clause.split()[0]
+            transaction_text = f"The {team['team_full_name']} {verb} {player.player}."
+        else:
+            transaction_text = f"The {team['team_full_name']} signed {player.player} to a {contract_clause}"
+
+            # EX clause: "1-year $2.3M contract." OR "1-year contract." OR "3-year $24.7M contract." (can't tell current annual salary on multi-years like this)
+            if contract_clause[0] == '1' and  '$' in contract_clause[7:]:
+                salary_figure = [x for x in contract_clause.split() if '$' in x][0]
+                new_salary = int(1000000*float(salary_figure.replace("$", "").replace("M", "").split("-")[0]))
+                salary_data = SalaryChange(player.current_salary, new_salary)
+
+
+    elif transaction_type == "contract extension":
+        from_team = team_id
+        to_team = team_id
+
+        transaction_text = f"The {team['team_full_name']} signed {player.player} to a {transaction_text.split(' to a ')[-1]}."
+
+
+    player_data = [Move(player_id, from_team, to_team)]
+    transaction_id = format_transaction_id(transaction_type, transaction['date'], player_data)
+    transaction_record = Transaction(transaction_id, transaction_type, transaction['date'], player_data, affected_teams, transaction_text, salary_data)
+
+    return commit_transaction(context, transaction_record, 'prosports')
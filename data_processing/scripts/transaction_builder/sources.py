@@ -0,0 +1,30 @@
+import csv
+import json
+
+import records
+from parsing import extract_element, require_element
+
+
+def load_players(filename='../data/players_start.csv'):
+    # {player_id: records.Player}, each starting at its preseason salary (see records.py)
+    return records.load_players(filename)
+
+
+def load_team_data(filename='../data/team_data.csv'):
+    with open(filename, 'r', encoding='utf-8-sig') as f:
+        return [x for x in csv.DictReader(f)]
+
+
+def filter_prosports_transactions(prosports_transactions):
+    prosports_transactions = [x for x in prosports_transactions if 'waived' in x['notes'] or 'contract option' in x['notes'] or 'signed' in x['notes'] or 'claimed' in x['notes']]
+    return [x for x in prosports_transactions if '10-day contract' not in x['notes'] and 'Exhibit 10' not in x['notes'] and 'two way contract' not in x['notes'] and 'option for 2021-22' not in x['notes'] and 're-signed' not in x['notes']]
+
+
+def load_prosports_transactions(filename='../data/supplementary_transaction_data.json'):
+    with open(filename, 'r') as f:
+        return filter_prosports_transactions(json.load(f))
+
+
+def get_transaction_dates(html):
+    content = require_element(extract_element(html, "div", {"id": "content"}), "ul", {"class": "page_index"})
+    return content.find_all("li")
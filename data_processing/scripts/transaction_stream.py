@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+
+import records
+from artifacts import file_hash, write_if_changed
+
+
+# transactions.json as newline-delimited JSON, one file per month plus an index.json manifest:
+#
+#   transactions/index.json      {"version", "count", "first_date", "last_date", "partitions": [{"month", "file", "first_date", "last_date", "count", "bytes", "sha256"}]}
+#   transactions/2020-11.ndjson  one transaction per line, in the same order as transactions.json
+#
+# PartitionedWriter takes transactions a date at a time and streams them straight to disk, so nothing accumulates in
+# memory. Partitions are built in a staging directory and only copied over the published ones that actually changed
+# when the writer is closed, so readers never see a half-written month. Readers can pick partitions out of the index
+# by date range and only fetch those (iter_transactions here, src/utils/transactionStream.js in the frontend).
+
+FORMAT_VERSION = 1
+INDEX_FILE = 'index.json'
+STAGING_DIR = '.building'
+
+
+def month_of(date):
+    return date[:7]
+
+
+class PartitionedWriter:
+    def __init__(self, out_dirs):
+        self.out_dirs = out_dirs
+        for out_dir in out_dirs:
+            os.makedirs(out_dir, exist_ok=True)
+
+        self.staging_dir = os.path.join(out_dirs[0], STAGING_DIR)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        os.makedirs(self.staging_dir)
+
+        self.partitions = {}
+        self.current_month = None
+        self.current_file = None
+
+    def open_partition(self, month):
+        if self.current_file:
+            self.current_file.close()
+
+        # Dates arrive in order, so a month is normally opened once; append in case a later season repeats one
+        self.current_month = month
+        self.current_file = open(os.path.join(self.staging_dir, f"{month}.ndjson"), 'a')
+        self.partitions.setdefault(month, {"month": month, "file": f"{month}.ndjson", "first_date": None, "last_date": None, "count": 0})
+
+    def write(self, transactions):
+        for transaction in transactions:
+            month = month_of(transaction.date)
+            if month != self.current_month:
+                self.open_partition(month)
+
+            self.current_file.write(json.dumps(transaction.to_json()) + '\n')
+
+            partition = self.partitions[month]
+            partition["first_date"] = min(partition["first_date"] or transaction.date, transaction.date)
+            partition["last_date"] = max(partition["last_date"] or transaction.date, transaction.date)
+            partition["count"] += 1
+
+        # Flushed per batch (one date), so a long build's progress is on disk rather than in buffers
+        if self.current_file:
+            self.current_file.flush()
+
+    def close(self):
+        if self.current_file:
+            self.current_file.close()
+            self.current_file = None
+
+        partitions = [self.partitions[x] for x in sorted(self.partitions)]
+        for partition in partitions:
+            staged = os.path.join(self.staging_dir, partition["file"])
+            partition["bytes"] = os.path.getsize(staged)
+            partition["sha256"] = file_hash(staged)
+
+            for out_dir in self.out_dirs:
+                published = os.path.join(out_dir, partition["file"])
+                if file_hash(published) != partition["sha256"]:
+                    shutil.copyfile(staged, published + '.tmp')
+                    os.replace(published + '.tmp', published)
+
+        index = {
+            "version": FORMAT_VERSION,
+            "count": sum(x["count"] for x in partitions),
+            "first_date": partitions[0]["first_date"] if partitions else None,
+            "last_date": partitions[-1]["last_date"] if partitions else None,
+            "partitions": partitions
+        }
+
+        # Index last, then drop months that no longer have any transactions
+        for out_dir in self.out_dirs:
+            write_if_changed(os.path.join(out_dir, INDEX_FILE), json.dumps(index, indent=1))
+
+            current_files = set(x["file"] for x in partitions)
+            for filename in os.listdir(out_dir):
+                if filename.endswith('.ndjson') and filename not in current_files:
+                    os.remove(os.path.join(out_dir, filename))
+
+        shutil.rmtree(self.staging_dir)
+        return index
+
+
+def load_index(directory):
+    with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+        return json.load(f)
+
+
+def partitions_between(index, start_date=None, end_date=None):
+    return [x for x in index["partitions"] if (start_date is None or x["last_date"] >= start_date) and (end_date is None or x["first_date"] <= end_date)]
+
+
+def iter_transactions(directory, start_date=None, end_date=None):
+    # Yields records.Transaction one line at a time, opening only the partitions that overlap [start_date, end_date]
+    for partition in partitions_between(load_index(directory), start_date, end_date):
+        with open(os.path.join(directory, partition["file"]), 'r') as f:
+            for line in f:
+                transaction = records.Transaction.from_json(json.loads(line))
+                if (start_date is None or transaction.date >= start_date) and (end_date is None or transaction.date <= end_date):
+                    yield transaction
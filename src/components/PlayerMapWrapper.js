@@ -25,7 +25,7 @@ let startState = [];
 let endState = [];
 
 
-const PlayerMapWrapper = ({ _geoData, _teamData, _playerData, transactionData }) => {
+const PlayerMapWrapper = ({ _geoData, _teamData, _playerData, transactionData, photoSprites }) => {
 
     const [mapColor, setMapColor] = useState(chromatic.schemeCategory10[0]);
     const [playerData, setPlayerData] = useState(_playerData);
@@ -195,7 +195,8 @@ const PlayerMapWrapper = ({ _geoData, _teamData, _playerData, transactionData })
             teamData,
             playerData,
             setPlayerData,
-            sizingAttribute
+            sizingAttribute,
+            photoSprites
         });
         
         scroller
@@ -6,6 +6,8 @@ import seedrandom from 'seedrandom';
 import { groupBy } from 'lodash';
 import { voronoiMapSimulation } from 'd3-voronoi-map';
 
+import { photoSprite } from '../utils/photoSprites';
+
 
 const getCirclePath = (center, radius) => {
     const circleCoordinates = getCircleCoordinates(parseFloat(center[0]), parseFloat(center[1]), radius, 20);
@@ -38,7 +40,7 @@ class PlayerMap {
 
     constructor(containerEl, props) {
         this.containerEl = containerEl;
-        const { width, height, mapColor, geoData, teamData, playerData, setPlayerData, sizingAttribute } = props;
+        const { width, height, mapColor, geoData, teamData, playerData, setPlayerData, sizingAttribute, photoSprites } = props;
 
         this.svg = d3.select(containerEl)
             .append("svg")
@@ -48,6 +50,7 @@ class PlayerMap {
 
         this.attribute = sizingAttribute;
         this.playerData = playerData;
+        this.photoSprites = photoSprites;
 
         this.polygonSets = [
             {
@@ -228,13 +231,21 @@ class PlayerMap {
                 .attr("height", 1)
                 .attr("width", 1)
                 .attr("patternUnits", "objectBoundingBox")
-                .append("svg:image")
-                    .attr("xlink:href", d => `images/player_photos/${d.player_id}.png`)
+                // Nested svg whose viewBox crops the player's cell out of the sprite atlas (see utils/photoSprites.js)
+                .append("svg:svg")
+                    .attr("viewBox", d => photoSprite(this.photoSprites, d.player_id).viewBox)
                     .attr("id", d => `${d.player_id}-photo-pattern`)
                     .attr("class", "player-photo-pattern")
                     .attr("width", d => d[this.attribute] === "-" ? 1 : Math.sqrt(this.weightScale(d[this.attribute]) * this.maxCircleRadius * this.maxWeight))
+                    .attr("height", d => d[this.attribute] === "-" ? 1 : Math.sqrt(this.weightScale(d[this.attribute]) * this.maxCircleRadius * this.maxWeight))
                     .attr("x", 0)
-                    .attr("y", 0);
+                    .attr("y", 0)
+                    .append("svg:image")
+                        .attr("xlink:href", d => photoSprite(this.photoSprites, d.player_id).href)
+                        .attr("width", d => photoSprite(this.photoSprites, d.player_id).width)
+                        .attr("height", d => photoSprite(this.photoSprites, d.player_id).height)
+                        .attr("x", 0)
+                        .attr("y", 0);
     };
     
 
@@ -593,6 +604,7 @@ class PlayerMap {
         // Resize photos
         vis.svg.selectAll(".player-photo-pattern")
             .attr("width", d => d[sizingAttribute] === "-" ? 1 : Math.sqrt(vis.weightScale(d[sizingAttribute]) * vis.maxCircleRadius * vis.maxWeight))
+            .attr("height", d => d[sizingAttribute] === "-" ? 1 : Math.sqrt(vis.weightScale(d[sizingAttribute]) * vis.maxCircleRadius * vis.maxWeight))
             .attr("x", d => d[sizingAttribute] === "-" ? 0 : -0.1 * Math.sqrt(vis.weightScale(d[sizingAttribute]) * vis.maxCircleRadius * vis.maxWeight))
 
         vis.svg.selectAll(".exit-polygon").remove();
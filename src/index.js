@@ -16,6 +16,11 @@ import { json, csv } from 'd3-fetch';
 import { groupBy } from 'lodash';
 import * as d3 from 'd3';
 
+// Utilities
+import decodeColumnar from './utils/columnar';
+import loadPhotoSprites from './utils/photoSprites';
+import loadManifest, { dataUrl } from './utils/manifest';
+
 
 // Components
 import PlayerMapWrapper from './components/PlayerMapWrapper';
@@ -67,21 +72,22 @@ const formatPlayerData = (playerData, teamData) => {
   return playerData;
 }
 
-// Begin loading datafiles
-const promises = [
-  json("data/us_states.json"),
-  csv("data/team_data.csv"),
-  csv("data/players_start.csv"),
-  json("data/transactions.json")
+// Begin loading datafiles, by their content-hashed names once the manifest is in
+const promises = (manifest) => [
+  json(dataUrl(manifest, "us_states.json")),
+  csv(dataUrl(manifest, "team_data.csv")),
+  json(dataUrl(manifest, "columnar.json")).then(decodeColumnar),
+  loadPhotoSprites()
 ];
 
 // Render React components (and inner d3 viz) on data load
-Promise.all(promises).then((allData) => {
+loadManifest().then(manifest => Promise.all(promises(manifest))).then((allData) => {
     const geoData = allData[0];
     let teamData = formatTeamData(allData[1]);
-    let playerData = formatPlayerData(allData[2], teamData);
-    let transactions = allData[3].filter(d => d.affected_teams.length > 1 || d.affected_teams[0] !== "FA");
+    let playerData = formatPlayerData(allData[2].playerData, teamData);
+    let transactions = allData[2].transactions.filter(d => d.affected_teams.length > 1 || d.affected_teams[0] !== "FA");
     let transactionData = groupBy(transactions, d => d.date);
+    const photoSprites = allData[3];
     
     const jsx =
       <div>
@@ -94,6 +100,7 @@ Promise.all(promises).then((allData) => {
           _teamData={teamData}
           _playerData={playerData}
           transactionData={transactionData}
+          photoSprites={photoSprites}
         />
         <Footer githubLink={"https://github.com/sdl60660/nba_player_movement"} />
       </div>
@@ -1,3 +1,4 @@
+const fs = require('fs');
 const path = require('path');
 const http = require('http');
 
@@ -17,6 +18,30 @@ app.set('view engine', 'hbs');
 app.set('views', viewsPath);
 hbs.registerPartials(partialsPath);
 
+// Content-hashed data files (data_processing/scripts/publish.py) never change, so they're cached for good and sent
+// as the prebuilt brotli/gzip copy the client accepts instead of being compressed per request
+const precompressed = [['br', '.br'], ['gzip', '.gz']];
+
+app.get('/data/published/:file', (req, res, next) => {
+    const filePath = path.join(publicDirectoryPath, 'data', 'published', path.basename(req.params.file));
+    const encoding = precompressed.find(([name, suffix]) => req.acceptsEncodings(name) && fs.existsSync(filePath + suffix));
+    if (!encoding && !fs.existsSync(filePath)) {
+        return next();
+    }
+
+    // Passed to sendFile rather than set up front, so they only go out once the file is found: a 404 for an unknown
+    // hashed name mustn't be cached for a year
+    const headers = { 'Cache-Control': 'public, max-age=31536000, immutable' };
+    res.vary('Accept-Encoding');
+    res.type(path.extname(filePath));
+
+    if (encoding) {
+        headers['Content-Encoding'] = encoding[0];
+        return res.sendFile(filePath + encoding[1], { headers }, err => err && next(err));
+    }
+    res.sendFile(filePath, { headers }, err => err && next());
+});
+
 // Setup static directory to serve
 app.use(express.static(publicDirectoryPath));
 
@@ -0,0 +1,94 @@
+// @flow
+
+// Decoder for data/columnar.json, the compact player + transaction artifact written by data_processing/scripts/columnar.py.
+// Returns the same shapes the app used to get from csv("data/players_start.csv") and json("data/transactions.json"),
+// except that numeric player columns arrive as numbers instead of strings.
+
+const decodeColumn = (column, count) => {
+  switch (column.type) {
+    case "constant":
+      return new Array(count).fill(column.value === null ? "" : column.value);
+    case "fixed":
+      return column.values.map(x => x === null ? "" : (column.scale === 1 ? x : x / column.scale));
+    case "dict":
+      return column.values.map(x => x === null ? "" : column.dictionary[x]);
+    case "path":
+      return column.values.map(x => x === null ? "" : `${column.dictionary[x[0]]}/${x[1]}`);
+    default:
+      return column.values.map(x => x === null ? "" : x);
+  }
+}
+
+const decodePlayers = (encoded) => {
+  const columns = {};
+  encoded.fields.forEach(field => {
+    columns[field] = decodeColumn(encoded.columns[field], encoded.count);
+  });
+
+  const players = [];
+  for (let i = 0; i < encoded.count; i++) {
+    const player = {};
+    encoded.fields.forEach(field => {
+      player[field] = columns[field][i];
+    });
+    players.push(player);
+  }
+
+  return players;
+}
+
+const addDays = (date, days) => {
+  const next = new Date(date.getTime());
+  next.setUTCDate(next.getUTCDate() + days);
+  return next;
+}
+
+const decodeTransactions = (encoded) => {
+  const transactions = [];
+  let currentDate = encoded.count ? new Date(`${encoded.date_base}T00:00:00Z`) : null;
+
+  for (let i = 0; i < encoded.count; i++) {
+    currentDate = addDays(currentDate, encoded.date_delta[i]);
+    const date = currentDate.toISOString().slice(0, 10);
+    const type = encoded.types[encoded.type[i]];
+
+    const players = [];
+    for (let j = encoded.players_offset[i]; j < encoded.players_offset[i+1]; j++) {
+      players.push({
+        player_id: encoded.player_ids[encoded.player[j]],
+        from_team: encoded.team_ids[encoded.from_team[j]],
+        to_team: encoded.team_ids[encoded.to_team[j]]
+      });
+    }
+
+    const defaultId = `${type}_${date}_${players.map(x => x.player_id).sort().join('-')}`;
+    const transaction = {
+      id: encoded.id_overrides[i] !== undefined ? encoded.id_overrides[i] : defaultId,
+      type,
+      date,
+      players,
+      affected_teams: encoded.affected_teams
+        .slice(encoded.affected_teams_offset[i], encoded.affected_teams_offset[i+1])
+        .map(x => encoded.team_ids[x]),
+      text: encoded.text[i]
+    };
+
+    if (encoded.salary_data[i] !== undefined) {
+      transaction.salary_data = {
+        start_salary: encoded.salary_data[i][0],
+        end_salary: encoded.salary_data[i][1]
+      };
+    }
+
+    transactions.push(transaction);
+  }
+
+  return transactions;
+}
+
+const decodeColumnar = (data) => ({
+  playerData: decodePlayers(data.players),
+  transactions: decodeTransactions(data.transactions)
+});
+
+export { decodeColumnar as default, decodePlayers, decodeTransactions };
@@ -0,0 +1,16 @@
+// @flow
+
+import { json } from 'd3-fetch';
+
+// data/manifest.json, written by data_processing/scripts/publish.py, maps each data file to a content-hashed copy
+// that can be cached for good. The manifest itself is always revalidated. Without a manifest (e.g. before the first
+// publish), or for a file it doesn't list, the plain data/<name> path is used.
+
+const loadManifest = (baseUrl = "data") => json(`${baseUrl}/manifest.json`, { cache: "no-cache" }).catch(() => null);
+
+const dataUrl = (manifest, name, baseUrl = "data") => {
+  const entry = manifest && manifest.files[name];
+  return `${baseUrl}/${entry ? entry.file : name}`;
+}
+
+export { loadManifest as default, dataUrl };
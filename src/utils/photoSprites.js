@@ -0,0 +1,24 @@
+// @flow
+
+import { json } from 'd3-fetch';
+
+// Player photos packed into sprite atlases by data_processing/scripts/optimize_photos.py. photoSprite() gives what the
+// map needs to show one player's cell: an <svg> viewBox around the cell and the atlas image to put inside it. Players
+// missing from the index (or every player, if the index couldn't be loaded) fall back to their individual PNG.
+
+const spriteBase = "images/player_sprites";
+
+const loadPhotoSprites = (baseUrl = spriteBase) => json(`${baseUrl}/index.json`).catch(() => null);
+
+const photoSprite = (index, playerId) => {
+  const position = index && index.photos[playerId];
+  if (!position) {
+    return { href: `images/player_photos/${playerId}.png`, viewBox: "0 0 1 1", width: 1, height: 1 };
+  }
+
+  const [atlasIndex, x, y] = position;
+  const atlas = index.atlases[atlasIndex];
+  return { href: `${spriteBase}/${atlas.webp}`, viewBox: `${x} ${y} ${index.size} ${index.size}`, width: atlas.width, height: atlas.height };
+}
+
+export { loadPhotoSprites as default, photoSprite };
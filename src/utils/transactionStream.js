@@ -0,0 +1,24 @@
+// @flow
+
+import { json, text } from 'd3-fetch';
+
+// Reader for the month-partitioned NDJSON transactions written by data_processing/scripts/transaction_stream.py
+// (get_transactions.py --output ndjson). Only the partitions overlapping the requested date range are fetched, and the
+// transactions come back in the same shape and order as data/transactions.json. Dates are YYYY-MM-DD strings, either
+// end can be left out.
+
+const partitionsBetween = (index, startDate, endDate) => index.partitions.filter(partition =>
+  (!startDate || partition.last_date >= startDate) && (!endDate || partition.first_date <= endDate)
+);
+
+const parseLines = (body) => body.split("\n").filter(line => line !== "").map(line => JSON.parse(line));
+
+const loadTransactionRange = (startDate, endDate, baseUrl = "data/transactions") => (
+  json(`${baseUrl}/index.json`).then(index => Promise.all(
+    partitionsBetween(index, startDate, endDate).map(partition => text(`${baseUrl}/${partition.file}`).then(parseLines))
+  )).then(partitions => partitions.flat().filter(transaction =>
+    (!startDate || transaction.date >= startDate) && (!endDate || transaction.date <= endDate)
+  ))
+);
+
+export { loadTransactionRange as default, partitionsBetween, parseLines };